@@ -21,32 +21,290 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import smbus
 import math
+import struct
+import collections
+import contextlib
+import SI5351Abus
+import SI5351Aplanner
+
+# number of registers in the register map (0 - 187)
+NUM_REGS = 188
+
+# registers that change independently of register writes (device status,
+# sticky status and the self clearing PLL reset) and so are never served
+# from the shadow register cache
+VOLATILE_REGS = (0, 1, 177)
+
+# register values after power up for an unprogrammed part, all other
+# registers reset to 0x00. Clock output drivers are powered down and the
+# crystal load capacitance is 10pF
+RESET_DEFAULTS = {16:0x80, 17:0x80, 18:0x80, 19:0x80, 20:0x80, 21:0x80,
+                  22:0x80, 23:0x80, 183:0xC0}
+
+# registers whose writes are kept in order inside a transaction, the
+# output enable register and the sticky status clear & PLL reset strobes
+ORDERED_REGS = (1, 3, 177)
+
+# registers where writing the current value still has an effect
+STROBE_REGS = (1, 177)
+
+# gaps between transaction writes bridged from the shadow register
+# cache, rewriting 2 unchanged bytes costs no more than a new write
+BRIDGE_GAP = 2
+
+# configuration registers written by restore, (first, last). The output
+# enable register (3) and PLL reset (177) are written separately
+RESTORE_RANGES = ((2, 2), (9, 9), (15, 92), (149, 170), (183, 183), (187, 187))
+
+# PLL reset bits (register 177) of the PLLs each register configures,
+# PLL A & B integer mode (bit 6 of 22 & 23) and the PLL A & B feedback
+# multisynths (26-33, 34-41)
+PLL_RESET_BITS = {22:0x20, 23:0x80}
+PLL_RESET_BITS.update({reg:0x20 for reg in range(26, 34)})
+PLL_RESET_BITS.update({reg:0x80 for reg in range(34, 42)})
+
+# PLL reset bits of the PLL input source register (15) bits, PLLA_SRC
+# (bit 2), PLLB_SRC (bit 3) and the CLKIN divider (bits 6 & 7) used by both
+PLL_SOURCE_BITS = {0x04:0x20, 0x08:0x80, 0xC0:0xA0}
+
+# PLL reset bits by pll_reset argument
+PLL_RESETS = {'A':0x20, 'B':0x80, 'BOTH':0xA0}
+
+# gaps of up to this many registers are read along with their
+# neighbours when verifying, a new block read costs 3 more bytes
+VERIFY_GAP = 3
+
+# R divider register bits for divide by 1 to 128
+R_DIV_BITS = {1:0b000, 2:0b001, 4:0b010, 8:0b011, 16:0b100,
+              32:0b101, 64:0b110, 128:0b111}
+
+# register layout of each clock output. control is the clock control
+# register, synth the first multisynth register and synthBytes the
+# number of multisynth registers (MS6 & MS7 are a single 8 bit even
+# integer divider). rDiv is the register holding the R divider bits,
+# rDivShift their position and mask, phase the initial phase offset
+# register (None for clocks 6 & 7). Bit 6 of the clock 6 & 7 control
+# registers is the PLL A & B integer mode bit, not the multisynth one
+ClockLayout = collections.namedtuple('ClockLayout', ['control', 'synth', 'synthBytes', 'rDiv',
+                                                     'rDivShift', 'phase'])
+
+CLOCK_LAYOUT = {0:ClockLayout(16, 42, 8, 44, 4, 165),
+                1:ClockLayout(17, 50, 8, 52, 4, 166),
+                2:ClockLayout(18, 58, 8, 60, 4, 167),
+                3:ClockLayout(19, 66, 8, 68, 4, 168),
+                4:ClockLayout(20, 74, 8, 76, 4, 169),
+                5:ClockLayout(21, 82, 8, 84, 4, 170),
+                6:ClockLayout(22, 90, 1, 92, 0, None),
+                7:ClockLayout(23, 91, 1, 92, 4, None)}
+
+def clock_registers():
+    """clock_registers, function to return the clocks configured by
+    each clock control, multisynth, R divider and phase offset register
+    in the form {reg:[clk, ...]}"""
+
+    clockRegs = {}
+    for clk in CLOCK_LAYOUT:
+        layout = CLOCK_LAYOUT[clk]
+        regs = [layout.control, layout.rDiv, layout.phase]
+        regs.extend(range(layout.synth, layout.synth + layout.synthBytes))
+        for reg in regs:
+            if reg is not None and clk not in clockRegs.setdefault(reg, []):
+                clockRegs[reg].append(clk)
+
+    return clockRegs
+
+# a change to one of these needs a reset of the PLL feeding the clocks
+# to take effect (or to line the outputs up again), see pll_reset
+CLOCK_REGS = clock_registers()
+
+# synth register frame, P3[15:0], R divider / divide by 4 / P1[17:16],
+# P1[15:0], P3[19:16] / P2[19:16], P2[15:0]
+SYNTH_FRAME = struct.Struct('>HBHBH')
+
+# spread spectrum registers 149-161, SSDN_P2, SSDN_P3, SSDN_P1[7:0],
+# SSUDP[11:8] / SSDN_P1[11:8], SSUDP[7:0], SSUP_P2, SSUP_P3, SSUP_P1[7:0],
+# SSUP_P1[11:8]
+SPREAD_FRAME = struct.Struct('>HHBBBHHBB')
+
+def pack_synth_bytes(buffer, synthSettings, divby4 = False, offset = 0):
+    """pack_synth_bytes, function to write the 8 synth register bytes
+    for synthSettings in the form (a, b, c) for a PLL or (a, b, c, R)
+    for a multisynth into buffer (a bytearray or writable memoryview)
+    at offset, without building any lists. Returns buffer"""
+
+    a, b, c = synthSettings[0], synthSettings[1], synthSettings[2]
+    R = synthSettings[3] if len(synthSettings) > 3 else 1
+
+    # P1, P2, P3 formulas from AN619, floor(128*(b/c)) done as (128*b)//c
+    q = (128*b)//c
+    P1 = 128*a + q - 512
+    P2 = 128*b - c*q
+
+    SYNTH_FRAME.pack_into(buffer, offset, c & 0xFFFF,
+                          (R_DIV_BITS.get(R, 0)<<4) | (divby4*0b1100) | ((P1>>16) & 0x03), P1 & 0xFFFF,
+                          ((c>>12) & 0xF0) | ((P2>>16) & 0x0F), P2 & 0xFFFF)
+
+    return buffer
+
+def pll_synth_bytes(synthSettings):
+    """pll_synth_bytes, function to return the 8 PLL synth register
+    bytes (registers 26-33 or 34-41) for synthSettings in the form
+    (a, b, c). Values returned in a list in write order"""
+
+    return list(pack_synth_bytes(bytearray(8), synthSettings[:3]))
+
+def clk_synth_bytes(synthSettings, divby4 = False):
+    """clk_synth_bytes, function to return the 8 multisynth register
+    bytes (e.g. registers 42-49 for clock 0) for synthSettings in the
+    form (a, b, c, R), including the R divider and divide by 4 bits.
+    Values returned in a list in write order"""
+
+    return list(pack_synth_bytes(bytearray(8), synthSettings, divby4))
+
+def save_image(path, image):
+    """save_image, function to save a register map image from
+    SI5351A.snapshot to a file"""
+
+    if len(image) != NUM_REGS:
+        raise ValueError('register map images are %d bytes' % NUM_REGS)
+
+    with open(path, 'wb') as f:
+        f.write(image)
+
+    return
+
+def load_image(path):
+    """load_image, function to load a register map image saved with
+    save_image"""
+
+    with open(path, 'rb') as f:
+        image = f.read()
+
+    if len(image) != NUM_REGS:
+        raise ValueError('%s is not a %d byte register map image' % (path, NUM_REGS))
+
+    return image
+
+class VerifyError(OSError):
+
+    def __init__(self, diff):
+
+        # diff is a list of (reg, expected, actual)
+        self.diff = diff
+        text = ', '.join('reg %d expected 0x%02X read 0x%02X' % d for d in diff)
+        OSError.__init__(self, 'register readback mismatch: ' + text)
+
+        return
 
 class SI5351A:
 
-    def __init__(self, i2cAddress, xtal = 25):
+    def __init__(self, i2cAddress, xtal = 25, shadow = None, bus = 1):
 
+        # bus is an i2c bus number or a bus object, see SI5351Abus.open_bus
         self.i2cAddress = i2cAddress
-        self.bus = smbus.SMBus(1)
+        self.bus = SI5351Abus.open_bus(bus)
         self.xtal = xtal * 1000000
 
+        # shadow register cache, None when disabled
+        self.shadow = None
+
+        # buffered writes while inside a transaction, None otherwise
+        self.txnSegments = None
+        self.txnDepth = 0
+
+        # last multisynth bytes written per clock, used by fine_tune when
+        # the shadow register cache is disabled
+        self.synthFrames = {}
+
+        # reusable buffer for synth frames, see pack_synth_bytes
+        self.frameBuffer = bytearray(8)
+        self.frameView = memoryview(self.frameBuffer)
+        self.spreadBuffer = bytearray(SPREAD_FRAME.size)
+
+        # write verification, see enable_verify. verifyPending holds
+        # {reg:value} written and not yet read back, None when disabled
+        self.verifyMode = None
+        self.verifyPending = None
+        self.verifyEvery = 1
+        self.verifyRetries = 2
+        self.verifyBatches = 0
+        self.verifying = False
+        self.txnFlushing = False
+
+        # cross process bus lock, see enable_lock. lockGeneration is the
+        # lock file generation the shadow register cache matches
+        self.busLock = None
+        self.lockDepth = 0
+        self.lockGeneration = None
+        self.lockWrote = False
+
+        # reset bits of the PLLs changed since their last reset, see
+        # pll_reset. The PLL state at start up is unknown
+        self.pllResetBits = 0xA0
+
+        # last value written to each clock control register {reg:value},
+        # the PLL feeding a clock without the shadow register cache
+        self.clockControls = {}
+
+        if shadow is not None:
+            self.enable_shadow(shadow)
+
         return
 
     def multi_access_write_i2c(self, reg=0x00, regValues = [0x00]):
         """multi_access_write_i2c, function to write to multiple registers at
         once"""
+
+        if self.txnSegments is not None:
+            self.buffer_write(reg, regValues)
+            return
         
+        if self.busLock is not None and self.lockDepth == 0:
+            # a write on its own holds the lock for just this write
+            with self.locked():
+                self.multi_access_write_i2c(reg = reg, regValues = regValues)
+            return
+
+        # frames may be bytearrays or memoryviews, smbus only takes lists
+        if not isinstance(regValues, list):
+            regValues = list(regValues)
+
         self.bus.write_i2c_block_data(self.i2cAddress, reg, regValues)
+        self.lockWrote = True
+        self.track_pll_writes(reg, regValues)
+
+        if self.shadow is not None:
+            self.shadow[reg:reg + len(regValues)] = regValues
+
+        if self.verifyPending is not None:
+            self.verify_written(reg, regValues)
 
         return
     
     def single_access_write_i2c(self, reg=0x00, regValue = 0):
         """single_access_write, function to write to a single 8 bit
         data register"""                  
+
+        if self.txnSegments is not None:
+            self.buffer_write(reg, [regValue])
+            return
        
+        if self.busLock is not None and self.lockDepth == 0:
+            # a write on its own holds the lock for just this write
+            with self.locked():
+                self.single_access_write_i2c(reg = reg, regValue = regValue)
+            return
+
         self.bus.write_byte_data(self.i2cAddress,reg, regValue)
+        self.lockWrote = True
+        self.track_pll_writes(reg, [regValue])
+
+        if self.shadow is not None:
+            self.shadow[reg] = regValue
+
+        if self.verifyPending is not None:
+            self.verify_written(reg, [regValue])
         
         return
 
@@ -66,6 +324,519 @@ class SI5351A:
         
         return dataTransfer
 
+    def track_pll_writes(self, reg, regValues):
+        """track_pll_writes, function to note which PLLs a bus write
+        changes, compared with the shadow register cache (any write
+        counts without it), and which a write to register 177 resets.
+        Changes to a clock's control, multisynth, R divider or phase
+        offset registers count against the PLL feeding the clock.
+        Called before the shadow register cache is updated"""
+
+        last = reg + len(regValues) - 1
+        if last < 15 or 92 < reg and last < 165 or 170 < reg and last < 177 or reg > 177:
+            return
+
+        shadow = self.shadow
+        for i in range(len(regValues)):
+            r = reg + i
+            if r == 177:
+                self.pllResetBits = self.pllResetBits & ~regValues[i]
+                continue
+
+            changed = 0xFF if shadow is None else shadow[r] ^ regValues[i]
+            if not changed:
+                continue
+
+            if r == 15:
+                for mask, bits in PLL_SOURCE_BITS.items():
+                    if changed & mask:
+                        self.pllResetBits = self.pllResetBits | bits
+                continue
+
+            # registers 22 & 23 are the clock 6 & 7 controls apart from
+            # bit 6, the PLL A & B integer mode bit
+            bits = PLL_RESET_BITS.get(r)
+            if bits is not None and (r not in (22, 23) or changed & 0x40):
+                self.pllResetBits = self.pllResetBits | bits
+
+            clks = CLOCK_REGS.get(r)
+            if clks is not None and (r not in (22, 23) or changed & 0xBF):
+                for clk in clks:
+                    self.pllResetBits = self.pllResetBits | self.clock_pll_bits(clk, reg, regValues)
+
+        for r in range(max(reg, 16), min(last, 23) + 1):
+            self.clockControls[r] = regValues[r - reg]
+
+        return
+
+    def clock_pll_bits(self, clk, reg, regValues):
+        """clock_pll_bits, function to return the register 177 reset
+        bit of the PLL feeding clock clk, from the control register
+        value being written in regValues (starting at reg), the shadow
+        register cache or the last value written. 0 for a powered
+        down clock, both PLLs if it isn't known"""
+
+        control = CLOCK_LAYOUT[clk].control
+        if reg <= control < reg + len(regValues):
+            regValue = regValues[control - reg]
+        elif self.shadow is not None:
+            regValue = self.shadow[control]
+        elif control in self.clockControls:
+            regValue = self.clockControls[control]
+        else:
+            return 0xA0
+
+        if regValue & 0x80:
+            # powered down, its PLL is reset when it is powered up
+            return 0
+
+        return 0x80 if regValue & 0x20 else 0x20
+
+    def read_register_map(self):
+        """read_register_map, function to read the full register map
+        (registers 0 - 187) using 32 byte block reads, or the bus's
+        maxBlockSize if it has one. Values returned in a bytearray
+        indexed by register"""
+
+        blockSize = getattr(self.bus, 'maxBlockSize', SI5351Abus.SMBUS_BLOCK_MAX)
+
+        regMap = bytearray()
+        for reg in range(0, NUM_REGS, blockSize):
+            numRead = min(blockSize, NUM_REGS - reg)
+            regMap += bytes(self.multi_access_read_i2c(reg = reg, numRead = numRead))
+
+        return regMap
+
+    def enable_shadow(self, fill = 'READ'):
+        """enable_shadow, function to enable the shadow register cache.
+        The cache is filled once, either by reading the register map
+        from the device (fill = 'READ') or from the power up reset
+        values (fill = 'DEFAULTS'), and then kept up to date on every
+        write"""
+
+        if fill == 'DEFAULTS':
+            shadow = bytearray(NUM_REGS)
+            for reg in RESET_DEFAULTS:
+                shadow[reg] = RESET_DEFAULTS[reg]
+            self.shadow = shadow
+        else:
+            self.shadow = self.read_register_map()
+
+        return
+
+    def disable_shadow(self):
+        """disable_shadow, function to disable the shadow register cache.
+        Read-modify-write operations go back to reading the device"""
+
+        self.shadow = None
+
+        return
+
+    def resync(self):
+        """resync, function to refill the shadow register cache from
+        the device, for use when the cache may be out of date"""
+
+        if self.shadow is not None:
+            self.shadow = self.read_register_map()
+
+        return
+
+    def shadow_read(self, reg):
+        """shadow_read, function to return the value of a register from
+        the shadow register cache if it is enabled, otherwise the
+        register is read from the device"""
+
+        if reg not in VOLATILE_REGS:
+            if self.txnSegments is not None:
+                # pending writes take priority over the cache
+                for segment in reversed(self.txnSegments):
+                    if reg in segment:
+                        return segment[reg]
+
+            if self.shadow is not None:
+                return self.shadow[reg]
+
+        return self.single_access_read_i2c(reg = reg)
+
+    def buffer_write(self, reg, regValues):
+        """buffer_write, function to add register writes to the
+        current transaction. Writes are held in segments of {reg:value},
+        a write to one of the ORDERED_REGS closes the current segment so
+        it is sent after everything written before it"""
+
+        segments = self.txnSegments
+
+        for i in range(len(regValues)):
+            r = reg + i
+            if r in ORDERED_REGS:
+                if not segments[-1]:
+                    segments.pop()
+
+                if r == 3 and segments and list(segments[-1]) == [3]:
+                    # back to back output enable writes, keep the last
+                    segments[-1][3] = regValues[i]
+                else:
+                    segments.append({r:regValues[i]})
+
+                segments.append({})
+            else:
+                segments[-1][r] = regValues[i]
+
+        return
+
+    def write_register_runs(self, regValues, dropUnchanged = False, bridgeGap = 0):
+        """write_register_runs, function to write a {reg:value} dict
+        to the chip using the fewest block writes. Registers are sorted
+        and split into contiguous runs of at most 32 bytes (or the bus's
+        maxBlockSize), sent in one call if the bus has write_blocks. If
+        dropUnchanged is True, writes matching the shadow register
+        cache are skipped. Gaps of up to bridgeGap registers between
+        runs are filled in from the shadow register cache so the runs
+        join up"""
+
+        # the bus lock (see enable_lock) covers the shadow register cache
+        # comparisons and the writes, including the write_blocks call
+        with self.locked():
+            regs = sorted(regValues)
+
+            if dropUnchanged and self.shadow is not None:
+                regs = [r for r in regs if r in STROBE_REGS or self.shadow[r] != regValues[r]]
+
+            blockSize = getattr(self.bus, 'maxBlockSize', SI5351Abus.SMBUS_BLOCK_MAX)
+
+            runs = []
+            for r in regs:
+                if runs and bridgeGap and self.shadow is not None:
+                    end = runs[-1][0] + len(runs[-1][1])
+                    gap = range(end, r)
+                    if (0 < len(gap) <= bridgeGap and len(runs[-1][1]) + len(gap) < blockSize
+                        and not any(g in VOLATILE_REGS or g in ORDERED_REGS for g in gap)):
+                        runs[-1][1].extend(self.shadow[g] for g in gap)
+
+                if runs and r == runs[-1][0] + len(runs[-1][1]) and len(runs[-1][1]) < blockSize:
+                    runs[-1][1].append(regValues[r])
+                else:
+                    runs.append((r, [regValues[r]]))
+
+            if len(runs) > 1 and self.txnSegments is None and hasattr(self.bus, 'write_blocks'):
+                # buses that can send several writes in one call, see
+                # SI5351Abus.RdwrBackend
+                self.bus.write_blocks(self.i2cAddress, runs)
+                self.lockWrote = True
+                for reg, data in runs:
+                    self.track_pll_writes(reg, data)
+
+                if self.shadow is not None:
+                    for reg, data in runs:
+                        self.shadow[reg:reg + len(data)] = bytes(data)
+
+                if self.verifyPending is not None:
+                    flushing = self.txnFlushing
+                    self.txnFlushing = True
+                    for reg, data in runs:
+                        self.verify_written(reg, data)
+                    self.txnFlushing = flushing
+                    if not flushing:
+                        self.verify_batch()
+
+                return
+
+            for reg, data in runs:
+                if len(data) == 1:
+                    self.single_access_write_i2c(reg = reg, regValue = data[0])
+                else:
+                    self.multi_access_write_i2c(reg = reg, regValues = data)
+
+        return
+
+    def enable_lock(self, path = None):
+        """enable_lock, function to share the device safely with other
+        processes. An fcntl lock file per bus and address (see
+        SI5351Abus.lock_path, or path) is held for each read-modify-write
+        and transaction, and for writes on their own. When another
+        process has written to the device since this one last held the
+        lock, the shadow register cache is refilled before going on.
+        Lock wait metrics are in busLock.stats()"""
+
+        if path is None:
+            path = SI5351Abus.lock_path(self.bus, self.i2cAddress)
+
+        self.busLock = SI5351Abus.open_lock(path)
+        self.lockGeneration = None
+
+        # take the lock once to bring the shadow register cache in step
+        with self.locked():
+            pass
+
+        return
+
+    def disable_lock(self):
+        """disable_lock, function to stop using the lock file"""
+
+        self.busLock = None
+
+        return
+
+    @contextlib.contextmanager
+    def locked(self):
+        """locked, context manager to hold the bus lock (if enabled,
+        see enable_lock) so a read-modify-write or a batch of writes is
+        atomic with respect to other processes. Reentrant, one lock
+        acquisition covers everything inside the outermost one"""
+
+        busLock = self.busLock
+        if busLock is None:
+            yield self
+            return
+
+        generation = busLock.acquire()
+        try:
+            if self.lockDepth == 0 and generation != self.lockGeneration:
+                # another process wrote to the device, the cached
+                # register values, multisynth frames and clock control
+                # values may be stale
+                self.resync()
+                self.synthFrames.clear()
+                self.clockControls.clear()
+                self.lockGeneration = generation
+
+            self.lockDepth = self.lockDepth + 1
+            try:
+                yield self
+            finally:
+                self.lockDepth = self.lockDepth - 1
+                if self.lockDepth == 0 and self.lockWrote:
+                    self.lockWrote = False
+                    self.lockGeneration = busLock.bump()
+        finally:
+            busLock.release()
+
+        return
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """transaction, context manager to buffer register writes and
+        send them on exit using the fewest block writes. Writes are
+        reordered by register between writes to registers 1, 3 and 177,
+        and writes that don't change the shadow register cache are
+        dropped. Transactions can be nested, the writes are sent when
+        the outermost one exits. If an exception is raised the buffered
+        writes are discarded"""
+
+        with self.locked():
+            if self.txnDepth == 0:
+                self.txnSegments = [{}]
+            self.txnDepth = self.txnDepth + 1
+
+            try:
+                yield self
+            finally:
+                self.txnDepth = self.txnDepth - 1
+                if self.txnDepth == 0:
+                    segments = self.txnSegments
+                    self.txnSegments = None
+
+            if self.txnDepth == 0:
+                self.txnFlushing = True
+                try:
+                    for segment in segments:
+                        if 177 in segment and segment[177] is None:
+                            # pll_reset(), the PLLs changed by the writes
+                            # sent so far are known now
+                            if not self.pllResetBits:
+                                continue
+                            segment = {177:self.pllResetBits}
+                        self.write_register_runs(segment, dropUnchanged = True, bridgeGap = BRIDGE_GAP)
+                finally:
+                    self.txnFlushing = False
+
+                if self.verifyPending is not None:
+                    self.verify_batch()
+
+        return
+
+    def enable_verify(self, mode = 'BATCH', every = 1, retries = 2):
+        """enable_verify, function to turn on write verification. The
+        expected value of every register written is kept and read back
+        with as few block reads as possible. mode 'WRITE' verifies after
+        every bus write, 'BATCH' after every every-th batch (a transaction
+        or a write outside one) and 'MANUAL' only when verify is called.
+        Registers 0, 1 and 177 are not verified"""
+
+        self.verifyMode = mode
+        self.verifyEvery = every
+        self.verifyRetries = retries
+        self.verifyBatches = 0
+        self.verifyPending = {}
+
+        return
+
+    def disable_verify(self):
+        """disable_verify, function to turn off write verification,
+        writes not yet read back are forgotten"""
+
+        self.verifyMode = None
+        self.verifyPending = None
+
+        return
+
+    def verify_written(self, reg, regValues):
+        """verify_written, function to record the expected values of a
+        bus write and verify now if the mode asks for it"""
+
+        pending = self.verifyPending
+        for i in range(len(regValues)):
+            if reg + i not in VOLATILE_REGS:
+                pending[reg + i] = regValues[i]
+
+        if self.verifying:
+            return
+
+        if self.verifyMode == 'WRITE':
+            self.verify()
+        elif self.verifyMode == 'BATCH' and not self.txnFlushing:
+            self.verify_batch()
+
+        return
+
+    def verify_batch(self):
+        """verify_batch, function to count a finished batch of writes
+        and verify every verifyEvery batches in 'BATCH' mode"""
+
+        if self.verifyMode == 'BATCH' and not self.verifying:
+            self.verifyBatches = self.verifyBatches + 1
+            if self.verifyBatches % self.verifyEvery == 0:
+                self.verify()
+
+        return
+
+    def read_back(self, regs):
+        """read_back, function to read a list of registers using the
+        fewest block reads, reading across gaps of up to VERIFY_GAP
+        registers. Values returned in a {reg:value} dict"""
+
+        blockSize = getattr(self.bus, 'maxBlockSize', SI5351Abus.SMBUS_BLOCK_MAX)
+
+        ranges = []
+        for r in sorted(regs):
+            if ranges and r - ranges[-1][1] <= VERIFY_GAP + 1 and r - ranges[-1][0] < blockSize:
+                ranges[-1][1] = r
+            else:
+                ranges.append([r, r])
+
+        values = {}
+        for first, last in ranges:
+            if first == last:
+                values[first] = self.single_access_read_i2c(reg = first)
+            else:
+                data = self.multi_access_read_i2c(reg = first, numRead = last - first + 1)
+                for i in range(len(data)):
+                    values[first + i] = data[i]
+
+        return values
+
+    def verify(self):
+        """verify, function to read back the registers written since
+        the last verify and compare them with the values written.
+        Mismatched registers are rewritten and checked again up to
+        verifyRetries times, then VerifyError is raised with the
+        differences and the shadow register cache is corrected to what
+        was read. Returns the number of registers checked"""
+
+        with self.locked():
+            if not self.verifyPending:
+                return 0
+
+            expected = self.verifyPending
+            self.verifyPending = {}
+            self.verifying = True
+
+            try:
+                checked = len(expected)
+                regs = list(expected)
+                for attempt in range(self.verifyRetries + 1):
+                    actual = self.read_back(regs)
+                    regs = [r for r in regs if actual[r] != expected[r]]
+                    if not regs or attempt == self.verifyRetries:
+                        break
+                    self.write_register_runs({r:expected[r] for r in regs})
+            finally:
+                self.verifying = False
+                if self.verifyPending is not None:
+                    self.verifyPending = {}
+
+            if regs:
+                if self.shadow is not None:
+                    for r in regs:
+                        self.shadow[r] = actual[r]
+                raise VerifyError([(r, expected[r], actual[r]) for r in regs])
+
+        return checked
+
+    def snapshot(self):
+        """snapshot, function to read the full register map (registers
+        0 - 187) with 32 byte block reads and return it as a bytes image
+        for restore or save_image. Also refreshes the shadow register
+        cache if it is enabled"""
+
+        regMap = self.read_register_map()
+
+        if self.shadow is not None:
+            self.shadow = bytearray(regMap)
+
+        return bytes(regMap)
+
+    def restore(self, image):
+        """restore, function to write a register map image from
+        snapshot back to the chip, see write_image. The configuration
+        registers in RESTORE_RANGES and the output enable register are
+        written"""
+
+        if len(image) != NUM_REGS:
+            raise ValueError('register map images are %d bytes' % NUM_REGS)
+
+        regs = [3]
+        for first, last in RESTORE_RANGES:
+            regs.extend(range(first, last + 1))
+
+        self.write_image(image, regs)
+
+        return
+
+    def write_image(self, image, regs):
+        """write_image, function to write the registers in regs from a
+        register map image in the datasheet order. Outputs are disabled,
+        the registers are written with coalesced block writes, the PLLs
+        are reset and then the output enable register is set from the
+        image, or put back as it was if regs doesn't include it.
+        Registers 0, 1 and 177 are never written from the image"""
+
+        with self.locked():
+            regValues = {}
+            for reg in regs:
+                if reg not in (0, 1, 3, 177):
+                    regValues[reg] = image[reg]
+
+            # multisynth bytes may change
+            self.synthFrames.clear()
+
+            if 3 in regs:
+                outputEnable = image[3]
+            else:
+                outputEnable = self.shadow_read(reg = 3)
+
+            # disable outputs
+            self.single_access_write_i2c(reg = 3, regValue = 0xFF)
+
+            self.write_register_runs(regValues, dropUnchanged = True)
+
+            self.pll_reset()
+
+            # enable outputs
+            self.single_access_write_i2c(reg = 3, regValue = outputEnable)
+
+        return
+
     def get_synth_settings(self, a, b, c):
         """get_synth_settings, function to return the P1, P2, P3
         setttings for a multisynth given the a + b/c values.
@@ -110,89 +881,277 @@ class SI5351A:
     def set_pll(self, pll = 'A', synthSettings = (24, 0, 1), intMode = True):
         """set_pll, function to set the either the A or B
         pll synth"""
-        
-        pllRegs = {'A':[22, 26], 'B':[23, 34]}
-        
-        if pll != 'A':
-            pll = 'B'
-            
-        # set PLLA & B source input, XTAL in this case
-        # write 0x00 to register 15 - should be default value
-        self.single_access_write_i2c(reg=15, regValue=0x00)
-            
-        # set PLL to fractional or integer  mode
-        # bit 6, of either register 22 or 23
-        regValue = self.single_access_read_i2c(reg=pllRegs[pll][0])
-        regValue = regValue & 0xBF        
-        
-        if intMode == True:
-             # PLL - integer mode
-            regValue = regValue + (1<<6)
-            
-        self.single_access_write_i2c(reg=pllRegs[pll][0], regValue=regValue)
-        
-        # set PLL sythn P1, P2, P3 registers
-        a, b, c = synthSettings[0], synthSettings[1], synthSettings[2]
-        pllSettings = self.get_synth_settings(a, b, c)
-        p1Bytes = self.p_byte_separation(pllSettings[0])
-        p2Bytes = self.p_byte_separation(pllSettings[1])
-        p3Bytes = self.p_byte_separation(pllSettings[2])
-        regP32 = (p3Bytes[0]<<4) + p2Bytes[0]
-        
-        pllBytes = p3Bytes[1:] + p1Bytes + [regP32] + p2Bytes[1:]
-        self.multi_access_write_i2c(reg=pllRegs[pll][1], regValues = pllBytes)
-        
+
+        with self.locked():
+            pllRegs = {'A':[22, 26], 'B':[23, 34]}
+
+            if pll != 'A':
+                pll = 'B'
+
+            # set PLLA & B source input, XTAL in this case
+            # write 0x00 to register 15 - should be default value, so
+            # only written if it isn't, a write resets the PLLs it changes
+            if self.shadow_read(reg=15) != 0x00:
+                self.single_access_write_i2c(reg=15, regValue=0x00)
+
+            # set PLL to fractional or integer  mode
+            # bit 6, of either register 22 or 23
+            regValue = self.shadow_read(reg=pllRegs[pll][0])
+            regValue = regValue & 0xBF        
+
+            if intMode == True:
+                 # PLL - integer mode
+                regValue = regValue + (1<<6)
+
+            self.single_access_write_i2c(reg=pllRegs[pll][0], regValue=regValue)
+
+            # set PLL sythn P1, P2, P3 registers
+            pack_synth_bytes(self.frameBuffer, synthSettings)
+            self.multi_access_write_i2c(reg=pllRegs[pll][1], regValues = self.frameBuffer)
+
         return
 
-    def set_clk_synth(self, clk = 0, synthSettings = (1200, 0, 1, 1), intMode = True, divby4 = False):
-        """set_clk_synth, function to set the either clock 0, 1 or 2
-        synth"""
-        
-        clkRegs = {0:[16, 42], 1:[17, 50], 2:[18, 58]}
-        rDivBits = {1:0b000, 2:0b001, 4:0b010, 8:0b011, 16:0b100,
-                    32:0b101, 64:0b110, 128:0b111}
-            
+    def clk_synth_registers(self, clk, synthSettings, intMode, divby4, regValues):
+        """clk_synth_registers, function to add the register values that
+        set the multisynth of clock clk to a {reg:value} dict. Clocks 0-5
+        get their integer mode bit and 8 multisynth bytes, clocks 6 & 7
+        their even integer divider (6-254) and R divider bits"""
+
+        layout = CLOCK_LAYOUT[clk]
+
+        if layout.synthBytes == 1:
+            a, b, c, R = synthSettings
+            if b != 0 or a%2 or a < SI5351Aplanner.MS67_MIN or a > SI5351Aplanner.MS67_MAX:
+                raise ValueError('clock %d needs an even integer divider from %d to %d'
+                                 % (clk, SI5351Aplanner.MS67_MIN, SI5351Aplanner.MS67_MAX))
+
+            regValues[layout.synth] = a
+
+            # R divider bits, shared register for clocks 6 & 7
+            regValue = regValues.get(layout.rDiv)
+            if regValue is None:
+                regValue = self.shadow_read(reg = layout.rDiv)
+            regValue = regValue & ~(0b111<<layout.rDivShift)
+            regValues[layout.rDiv] = regValue | (R_DIV_BITS.get(R, 0)<<layout.rDivShift)
+
+            return
+
         # set clk to fractional or integer  mode
-        # bit 6, of either register 16, 17 or 18     
+        # bit 6 of the clock control register
         if intMode == True:
-            intBit = 0b1 # integer mode      
+            intBit = 0b1 # integer mode
         else:
             intBit = 0b0 # fractional mode
-            
-        regValue = self.single_access_read_i2c(reg=clkRegs[clk][0])
+
+        regValue = self.shadow_read(reg = layout.control)
         regValue = regValue & 0xBF
-        regValue = regValue | (intBit<<6)
-        self.single_access_write_i2c(reg=clkRegs[clk][0], regValue=regValue) 
-        
-        # set clk sythn P1, P2, P3 registers
-        a, b, c = synthSettings[0], synthSettings[1], synthSettings[2]
-        clkSettings = self.get_synth_settings(a, b, c)
-        p1Bytes = self.p_byte_separation(clkSettings[0])
-        p2Bytes = self.p_byte_separation(clkSettings[1])
-        p3Bytes = self.p_byte_separation(clkSettings[2])
-        regP32 = (p3Bytes[0]<<4) + p2Bytes[0]
-        
-        # add in R divider and divide by 4 info
-        p1Bytes[0] = (rDivBits.get(synthSettings[3], 0)<<4) + (divby4<<2) + (divby4<<1) + p1Bytes[0]
-        
-        clkBytes = p3Bytes[1:] + p1Bytes + [regP32] + p2Bytes[1:]
-        self.multi_access_write_i2c(reg=clkRegs[clk][1], regValues = clkBytes)
-        
+        regValues[layout.control] = regValue | (intBit<<6)
+
+        # set clk sythn P1, P2, P3 registers, R divider and divide by 4 bits
+        clkBytes = pack_synth_bytes(self.frameBuffer, synthSettings, divby4)
+        for i in range(8):
+            regValues[layout.synth + i] = clkBytes[i]
+
+        return
+
+    def set_clk_synth(self, clk = 0, synthSettings = (1200, 0, 1, 1), intMode = True, divby4 = False):
+        """set_clk_synth, function to set the synth for one of clocks
+        0 - 7. Clocks 6 & 7 only take even integer dividers from 6 to
+        254 (b = 0), intMode and divby4 are ignored for them"""
+
+        self.set_clk_synths({clk:(synthSettings, intMode, divby4)})
+
+        return
+
+    def set_clk_synths(self, clkDict = None):
+        """set_clk_synths, function to set the synths for several clocks
+        at once. With the shadow register cache enabled the registers
+        between the clocks are filled in from the cache, so the
+        multisynth registers (42-92) go out as one contiguous block
+        write (split at 32 bytes) instead of one write per clock"""
+
+        # clkDict format {clk#:(synthSettings, intMode, divby4)}
+        # e.g. {0:((900, 0, 1, 1), True, False), 6:((100, 0, 1, 1), True, False)}
+
+        if not clkDict:
+            return
+
+        with self.locked():
+            regValues = {}
+            for clk in sorted(clkDict):
+                synthSettings, intMode, divby4 = clkDict[clk]
+                self.clk_synth_registers(clk, synthSettings, intMode, divby4, regValues)
+
+            if self.shadow is not None and self.txnSegments is None:
+                # fill in the multisynth registers between the clocks
+                synthRegs = [r for r in regValues if r >= 42]
+                for r in range(min(synthRegs), max(synthRegs)):
+                    if r not in regValues:
+                        regValues[r] = self.shadow[r]
+
+            self.write_register_runs(regValues)
+
+            for clk in clkDict:
+                layout = CLOCK_LAYOUT[clk]
+                if layout.synthBytes == 8:
+                    self.synthFrames[clk] = bytes(regValues[layout.synth + i] for i in range(8))
+
+        return
+
+    def write_clk_synth_frame(self, clk, frame):
+        """write_clk_synth_frame, function to write a multisynth frame
+        (the 8 bytes from clk_synth_bytes) for clock clk, writing only
+        the smallest contiguous range of bytes that differ from what was
+        last written. The previous bytes come from the shadow register
+        cache, or without it from the last set_clk_synth/fine_tune for
+        the clock. There is no control register read and no PLL reset.
+        Returns the number of bytes written"""
+
+        with self.locked():
+            layout = CLOCK_LAYOUT[clk]
+            if layout.synthBytes != 8:
+                raise ValueError('clock %d has an integer only multisynth' % clk)
+
+            base = layout.synth
+
+            # previous bytes, old[oldBase + i] for byte i
+            oldBase = 0
+            if self.shadow is None:
+                old = self.synthFrames.get(clk)
+            elif self.txnSegments is None:
+                old = self.shadow
+                oldBase = base
+            else:
+                old = [self.shadow_read(reg = base + i) for i in range(8)]
+
+            if old is None:
+                first, last = 0, 7
+            else:
+                first = last = None
+                for i in range(8):
+                    if old[oldBase + i] != frame[i]:
+                        if first is None:
+                            first = i
+                        last = i
+
+                if first is None:
+                    return 0
+
+            if first == last:
+                self.single_access_write_i2c(reg = base + first, regValue = frame[first])
+            else:
+                self.multi_access_write_i2c(reg = base + first, regValues = frame[first:last + 1])
+
+            self.synthFrames[clk] = bytes(frame)
+
+        return last - first + 1
+
+    def fine_tune(self, clk, synthSettings, divby4 = False):
+        """fine_tune, function for fast small frequency steps on clock
+        clk. Works out the multisynth bytes for synthSettings (a, b, c, R)
+        and writes only the bytes that changed, see write_clk_synth_frame.
+        The integer mode bit is not changed, so use it for steps that
+        stay in the clock's current mode. Returns the number of bytes
+        written"""
+
+        pack_synth_bytes(self.frameBuffer, synthSettings, divby4)
+
+        return self.write_clk_synth_frame(clk, self.frameView)
+
+    def plan_frequency(self, freq, pllFreq = None):
+        """plan_frequency, function to return the PLL and clock synth
+        settings for an output frequency in Hz, see
+        SI5351Aplanner.plan_frequency. Returns a FrequencyPlan with
+        the achieved frequency and the error in ppm"""
+
+        return SI5351Aplanner.plan_frequency(self.xtal, freq, pllFreq)
+
+    def set_frequency(self, clk, freq, pll = 'A', pllFreq = None, reset = True):
+        """set_frequency, function to set a clock output to freq (Hz).
+        Sets the PLL, the clock synth and the clock control PLL source
+        and power down bits, then optionally resets the PLLs. Pass
+        pllFreq to keep a PLL shared with other outputs at a fixed
+        frequency. Returns the FrequencyPlan used"""
+
+        plan = self.plan_frequency(freq, pllFreq)
+
+        with self.transaction():
+            self.set_pll(pll, plan.pllSettings, intMode = plan.pllIntMode)
+
+            self.set_clk_source(clk, pll)
+            self.set_clk_synth(clk, plan.synthSettings, intMode = plan.intMode, divby4 = plan.divby4)
+
+            if reset == True:
+                self.pll_reset()
+
+        return plan
+
+    def set_clk_source(self, clk, pll = 'A'):
+        """set_clk_source, function to power up clock clk and set it to
+        use its multisynth fed from PLL A or B. The integer mode, invert
+        and drive strength bits are kept"""
+
+        with self.locked():
+            synthSources = {'A':0, 'B':1}
+
+            clkReg = CLOCK_LAYOUT[clk].control
+            regValue = self.shadow_read(reg = clkReg)
+            regValue = (regValue & 0x53) | (synthSources.get(pll, 1)<<5) | (0b11<<2)
+            self.single_access_write_i2c(reg = clkReg, regValue = regValue)
+
+        return
+
+    def plan_outputs(self, freqs, tolerance = SI5351Aplanner.DEFAULT_TOLERANCE, clks = None):
+        """plan_outputs, function to work out the PLL A & B frequencies
+        and PLL assignments for several output frequencies in Hz, see
+        SI5351Aplanner.plan_outputs. Returns an OutputPlan"""
+
+        return SI5351Aplanner.plan_outputs(self.xtal, freqs, tolerance, clks)
+
+    def set_outputs(self, outputPlan, clks = None, reset = True):
+        """set_outputs, function to program an OutputPlan from
+        plan_outputs. clks are the clock numbers of the outputs, default
+        0, 1, 2... Everything is written in one transaction"""
+
+        if clks is None:
+            clks = list(range(len(outputPlan.plans)))
+
+        with self.transaction():
+            for pll in sorted(outputPlan.pllFreqs):
+                plan = outputPlan.plans[outputPlan.assignments.index(pll)]
+                self.set_pll(pll, plan.pllSettings, intMode = plan.pllIntMode)
+
+            clkDict = {}
+            for i in range(len(clks)):
+                plan = outputPlan.plans[i]
+                self.set_clk_source(clks[i], outputPlan.assignments[i])
+                clkDict[clks[i]] = (plan.synthSettings, plan.intMode, plan.divby4)
+
+            self.set_clk_synths(clkDict)
+
+            if reset == True:
+                self.pll_reset()
+
         return
 
     def set_clk_control(self, clk, pwrDown = True, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2):
         """set_clk_control, function to set the control register for the clk provided"""
-        
-        clkReg = clk + 16
-        synthSources = {'A':0, 'B':1}
-        clkSources = {'XTAl':0b00, 'CLKIN':0b01, 'CLK0':0b10, 'SYNTH':0b11}
-        driveStrengths = {2:0b00, 4:0b01, 6:0b10, 8:0b11}
-        
-        controlByte = (pwrDown<<7) + (intMode<<6) + (synthSources.get(synthSource, 0)<<5) + (outInv<<4)
-        controlByte = controlByte + (clkSources.get(clkSource, 0b11)<<2) + driveStrengths.get(driveStrength, 0b00)   
-        
-        self.single_access_write_i2c(reg = clkReg, regValue = controlByte)
-        
+
+        with self.locked():
+            clkReg = CLOCK_LAYOUT[clk].control
+            synthSources = {'A':0, 'B':1}
+            clkSources = {'XTAl':0b00, 'CLKIN':0b01, 'CLK0':0b10, 'SYNTH':0b11}
+            driveStrengths = {2:0b00, 4:0b01, 6:0b10, 8:0b11}
+
+            controlByte = (pwrDown<<7) + (intMode<<6) + (synthSources.get(synthSource, 0)<<5) + (outInv<<4)
+            controlByte = controlByte + (clkSources.get(clkSource, 0b11)<<2) + driveStrengths.get(driveStrength, 0b00)   
+
+            if CLOCK_LAYOUT[clk].synthBytes == 1:
+                # clocks 6 & 7, bit 6 is the PLL integer mode bit, keep it
+                controlByte = (controlByte & 0xBF) | (self.shadow_read(reg = clkReg) & 0x40)
+
+            self.single_access_write_i2c(reg = clkReg, regValue = controlByte)
+
         return
 
     def disable_all_outputs(self, pwrDn = True):
@@ -215,32 +1174,43 @@ class SI5351A:
         """enable_outputs, funcion to enable/disable 1
         or more clock outputs. This sets Register 3"""
 
-        # clkDict format {clk#:True/False}
-        # e.g. {0:'True'} - enable CLK0
+        with self.locked():
+            # clkDict format {clk#:True/False}
+            # e.g. {0:'True'} - enable CLK0
 
-        regValue = self.single_access_read_i2c(reg = 3)
+            regValue = self.shadow_read(reg = 3)
 
-        
-        for k in clkDict:
-            if clkDict[k] == True:
-                mask = 0xFF & ~(1<<k)
-                regValue = regValue & mask
-            else:
-                mask = 0x00 | (1<<k)
-                regValue = regValue | mask        
 
-        #print(hex(regValue))
-        self.single_access_write_i2c(reg = 3, regValue = regValue)
+            for k in clkDict:
+                if clkDict[k] == True:
+                    mask = 0xFF & ~(1<<k)
+                    regValue = regValue & mask
+                else:
+                    mask = 0x00 | (1<<k)
+                    regValue = regValue | mask        
 
-        return
+            #print(hex(regValue))
+            self.single_access_write_i2c(reg = 3, regValue = regValue)
 
-    def pll_reset(self):
-        """pll_reset, function to do a soft reset of
-        both pll A & B. This sets register 177"""
+        return
 
-        # Apply PLLA and PLLB soft reset
-        # write 0xA0 to register 177
-        self.single_access_write_i2c(reg=177, regValue=0xA0)
+    def pll_reset(self, pll = None):
+        """pll_reset, function to do a soft reset of PLL A and/or B.
+        This sets register 177. With pll = None only the PLLs whose
+        registers (15 source bits, 22/23 bit 6, 26-33 for A and 34-41
+        for B) or whose clocks' control, multisynth, R divider or phase
+        offset registers changed since their last reset are reset, and nothing
+        is written if none did. pll = 'A', 'B' or 'BOTH' always resets
+        those. In a transaction the changed PLLs are worked out when it
+        is sent"""
+
+        if pll is not None:
+            self.single_access_write_i2c(reg=177, regValue=PLL_RESETS[pll])
+        elif self.txnSegments is not None:
+            self.buffer_write(177, [None])
+        elif self.pllResetBits:
+            # Apply PLLA and/or PLLB soft reset
+            self.single_access_write_i2c(reg=177, regValue=self.pllResetBits)
 
         return
 
@@ -258,22 +1228,23 @@ class SI5351A:
         output enable (OEB) pin for 1 or more clock outputs.
         This sets register 9"""
 
-        # clkDict format {clk#:True/Fa;se}
-        # e.g. {0:'True'} - enable OEB pin for CLK0
+        with self.locked():
+            # clkDict format {clk#:True/Fa;se}
+            # e.g. {0:'True'} - enable OEB pin for CLK0
 
-        regValue = self.single_access_read_i2c(reg = 9)
+            regValue = self.shadow_read(reg = 9)
 
-        
-        for k in clkDict:
-            if clkDict[k] == True:
-                mask = 0xFF & ~(1<<k)
-                regValue = regValue & mask
-            else:
-                mask = 0x00 | (1<<k)
-                regValue = regValue | mask        
 
-        #print(hex(regValue))
-        self.single_access_write_i2c(reg = 9, regValue = regValue)
+            for k in clkDict:
+                if clkDict[k] == True:
+                    mask = 0xFF & ~(1<<k)
+                    regValue = regValue & mask
+                else:
+                    mask = 0x00 | (1<<k)
+                    regValue = regValue | mask        
+
+            #print(hex(regValue))
+            self.single_access_write_i2c(reg = 9, regValue = regValue)
 
         return
 
@@ -294,7 +1265,9 @@ class SI5351A:
         # could improve this function in the future to do the
         # actual calculation
 
-        clkReg = clk + 165
+        clkReg = CLOCK_LAYOUT[clk].phase
+        if clkReg is None:
+            raise ValueError('clock %d has no initial phase offset' % clk)
         
         self.single_access_write_i2c(reg = clkReg, regValue = offset)
 
@@ -321,12 +1294,13 @@ class SI5351A:
         output on PLLA and it's associated clock outputs. This sets
         bit 7 of Register 149"""
 
-        regValue = self.single_access_read_i2c(reg = 149)
+        with self.locked():
+            regValue = self.shadow_read(reg = 149)
 
-        mask = regValue & 0x7F
-        regValue = (enable<<7) | mask
+            mask = regValue & 0x7F
+            regValue = (enable<<7) | mask
 
-        self.single_access_write_i2c(reg = 149, regValue = regValue)
+            self.single_access_write_i2c(reg = 149, regValue = regValue)
 
         return
 
@@ -341,7 +1315,6 @@ class SI5351A:
         # Up/Down Parameter
         # SSUDP[11:0] = Floor(xtalF/4x31500)
         SSUDP = math.floor(xtalF/(4*31500))
-        SSUDP_bytes = self.s_byte_separation(SSUDP)
 
         SSUP = 128*pllARatio*(sscAMP/((1-sscAMP)*SSUDP))
         SSDN = 128*pllARatio*(sscAMP/((1+sscAMP)*SSUDP))
@@ -354,10 +1327,6 @@ class SI5351A:
         SSDN_P2 = int(32767*(SSDN-SSDN_P1))
         SSDN_P3 = 32767
 
-        SSDN_P1_bytes = self.s_byte_separation(SSDN_P1)
-        SSDN_P2_bytes = self.s_byte_separation(SSDN_P2)
-        SSDN_P3_bytes = self.s_byte_separation(SSDN_P3)
-
         if mode == 'CENTER':            
             # Up-spread parameters
             # SSUP_P1[11:0] = Floor(SSUP)
@@ -376,24 +1345,15 @@ class SI5351A:
             SSUP_P2 = 0
             SSUP_P3 = 1
             
-        SSUP_P1_bytes = self.s_byte_separation(SSUP_P1)
-        SSUP_P2_bytes = self.s_byte_separation(SSUP_P2)
-        SSUP_P3_bytes = self.s_byte_separation(SSUP_P3)
-
-        reg154 = (SSUDP_bytes[0]<<4) + SSDN_P1_bytes[0]
-        reg161 = 0x0F & SSUP_P1_bytes[0]       
-        
         # need to add SSC_Mode bit (down vs center spread) to SSDN_P3[14:8] register (register 151)
         # Bit 7: 0 - down spread, 1 - center spread
-        if mode == 'CENTER':
-            SSDN_P3_bytes[0] = 0x80 + SSDN_P3_bytes[0]            
-        else:
-            SSDN_P3_bytes[0] = 0x7F & SSDN_P3_bytes[0]       
-        
-        SS_bytes = SSDN_P2_bytes + SSDN_P3_bytes + SSDN_P1_bytes[1:] + [reg154]
-        SS_bytes = SS_bytes + SSUDP_bytes[1:] + SSUP_P2_bytes + SSUP_P3_bytes + SSUP_P1_bytes[1:] + [reg161]
+        SSDN_P3 = ((mode == 'CENTER')<<15) | (SSDN_P3 & 0x7FFF)
+
+        SPREAD_FRAME.pack_into(self.spreadBuffer, 0, SSDN_P2 & 0xFFFF, SSDN_P3, SSDN_P1 & 0xFF,
+                               (((SSUDP>>8)<<4) | (SSDN_P1>>8)) & 0xFF, SSUDP & 0xFF,
+                               SSUP_P2 & 0xFFFF, SSUP_P3 & 0xFFFF, SSUP_P1 & 0xFF, (SSUP_P1>>8) & 0x0F)
 
-        self.multi_access_write_i2c(reg=149, regValues = SS_bytes)
+        self.multi_access_write_i2c(reg=149, regValues = self.spreadBuffer)
 
         return
 
@@ -413,32 +1373,33 @@ class SI5351A:
         state when it is disabled. Valid values are LOW, HIGH, HIGH_IMPEDANCE
         and NEVER. This sets Registers 24 and 25"""
 
-        # stateDict format {clk#:STATE}
-        # e.g. {0:'HIGH_IMPEDANCE', 2:'LOW'}
+        with self.locked():
+            # stateDict format {clk#:STATE}
+            # e.g. {0:'HIGH_IMPEDANCE', 2:'LOW'}
 
-        stateValues = {'LOW':0b00, 'HIGH':0b01, 'HIGH_IMPEDANCE':0b10, 'NEVER':0b11}
-        regPositions = [0, 2, 4, 6, 0, 2, 4, 6] # bit offsets for the 8 clocks
+            stateValues = {'LOW':0b00, 'HIGH':0b01, 'HIGH_IMPEDANCE':0b10, 'NEVER':0b11}
+            regPositions = [0, 2, 4, 6, 0, 2, 4, 6] # bit offsets for the 8 clocks
 
-        regValue1 = self.single_access_read_i2c(reg = 24)
-        regValue2 = self.single_access_read_i2c(reg = 25)
+            regValue1 = self.shadow_read(reg = 24)
+            regValue2 = self.shadow_read(reg = 25)
 
-        for k in stateDict:
-            if k < 4:
-                # clocks 0 to 3
-                mask = regValue1 & ~(0b11<<regPositions[k])
-                if stateDict[k] == 'LOW':
-                    regValue1 = mask
+            for k in stateDict:
+                if k < 4:
+                    # clocks 0 to 3
+                    mask = regValue1 & ~(0b11<<regPositions[k])
+                    if stateDict[k] == 'LOW':
+                        regValue1 = mask
+                    else:
+                        regValue1 =  regValue1 | (stateValues.get(stateDict[k], 0b00)<<regPositions[k])
                 else:
-                    regValue1 =  regValue1 | (stateValues.get(stateDict[k], 0b00)<<regPositions[k])
-            else:
-                # clocks 4 to 7
-                mask = regValue2 & ~(0b11<<regPositions[k])
-                if stateDict[k] == 'LOW':
-                    regValue2 = mask
-                else:
-                    regValue2 =  regValue2 | (stateValues.get(stateDict[k], 0b00)<<regPositions[k])
-        
-        self.multi_access_write_i2c(reg=24, regValues = [regValue1, regValue2])
+                    # clocks 4 to 7
+                    mask = regValue2 & ~(0b11<<regPositions[k])
+                    if stateDict[k] == 'LOW':
+                        regValue2 = mask
+                    else:
+                        regValue2 =  regValue2 | (stateValues.get(stateDict[k], 0b00)<<regPositions[k])
+
+            self.multi_access_write_i2c(reg=24, regValues = [regValue1, regValue2])
 
         return
 
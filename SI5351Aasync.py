@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""SI5351Aasync, asyncio version of the SI5351A python module. Bus
+transfers run on a worker thread per i2c bus so the event loop is not
+blocked
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import contextlib
+import functools
+import sys
+import SI5351A
+import SI5351Abus
+
+def async_method(name):
+    """async_method, function to return a coroutine method that runs
+    SI5351A.name on the bus worker thread"""
+
+    async def method(self, *args, **kwargs):
+
+        return await self.run(getattr(self.device, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = '%s, coroutine version of SI5351A.%s' % (name, name)
+
+    return method
+
+class AsyncSI5351A:
+
+    def __init__(self, i2cAddress, xtal = 25, shadow = None, bus = 1, device = None):
+
+        # wrap an existing SI5351A or create one, note creating one with
+        # shadow = 'READ' reads the chip before returning
+        if device is None:
+            device = SI5351A.SI5351A(i2cAddress, xtal = xtal, shadow = shadow, bus = bus)
+
+        self.device = device
+        self.executor = SI5351Abus.bus_executor(device.bus)
+
+        return
+
+    async def run(self, func, *args, **kwargs):
+        """run, coroutine to run func(*args, **kwargs) on the bus worker
+        thread and return its result. Use for sequences of calls that
+        must not be interleaved with other work on the bus"""
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """transaction, async context manager version of
+        SI5351A.transaction. Writes made through this device while it is
+        open, from any coroutine, are buffered and sent on exit"""
+
+        txn = self.device.transaction()
+        await self.run(txn.__enter__)
+
+        try:
+            yield self
+        except BaseException:
+            await self.run(txn.__exit__, *sys.exc_info())
+            raise
+
+        await self.run(txn.__exit__, None, None, None)
+
+        return
+
+    def plan_frequency(self, freq, pllFreq = None):
+        """plan_frequency, see SI5351A.plan_frequency, no bus access so
+        not a coroutine"""
+
+        return self.device.plan_frequency(freq, pllFreq)
+
+    set_pll = async_method('set_pll')
+    set_clk_synth = async_method('set_clk_synth')
+    set_clk_control = async_method('set_clk_control')
+    set_frequency = async_method('set_frequency')
+    disable_all_outputs = async_method('disable_all_outputs')
+    enable_outputs = async_method('enable_outputs')
+    pll_reset = async_method('pll_reset')
+    disable_OEB_pin_all = async_method('disable_OEB_pin_all')
+    enable_OEB_pin = async_method('enable_OEB_pin')
+    fanout_enable = async_method('fanout_enable')
+    set_initial_offset = async_method('set_initial_offset')
+    read_status = async_method('read_status')
+    clear_status = async_method('clear_status')
+    spread_spectrum_enable = async_method('spread_spectrum_enable')
+    set_spread_spectrum = async_method('set_spread_spectrum')
+    set_xtal_capacitance = async_method('set_xtal_capacitance')
+    set_clk_disable_state = async_method('set_clk_disable_state')
+    enable_shadow = async_method('enable_shadow')
+    resync = async_method('resync')
+    read_register_map = async_method('read_register_map')
+    write_register_runs = async_method('write_register_runs')
+    multi_access_write_i2c = async_method('multi_access_write_i2c')
+    single_access_write_i2c = async_method('single_access_write_i2c')
+    multi_access_read_i2c = async_method('multi_access_read_i2c')
+    single_access_read_i2c = async_method('single_access_read_i2c')
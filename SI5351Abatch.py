@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""SI5351Abatch, NumPy batch versions of the SI5351A synth calculations
+for working out the register bytes of many channels at once
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# NumPy is only needed by this module, SI5351A.py works without it
+
+import numpy as np
+from SI5351Aplanner import MS_MAX, MAX_DENOM, MS_SNAP_TOLERANCE
+
+# frequencies are rounded to 1/FREQ_SCALE Hz (1mHz) so the divider
+# search can be done with int64 arithmetic
+FREQ_SCALE = 1000
+
+def synth_parameters(a, b, c):
+    """synth_parameters, batch version of SI5351A.get_synth_settings.
+    Returns the P1, P2, P3 int64 arrays for arrays of a + b/c values,
+    computed with integer arithmetic"""
+
+    a = np.asarray(a, dtype = np.int64)
+    b = np.asarray(b, dtype = np.int64)
+    c = np.asarray(c, dtype = np.int64)
+
+    # floor(128*(b/c)) = (128*b)//c and 128*b - c*floor(128*(b/c)) = (128*b)%c
+    P1 = 128*a + (128*b)//c - 512
+    P2 = (128*b)%c
+    P3 = c
+
+    return (P1, P2, P3)
+
+def synth_register_bytes(a, b, c, R = 1, divby4 = False):
+    """synth_register_bytes, batch version of the register bytes written
+    by SI5351A.set_clk_synth. Takes arrays (or scalars) of a, b, c, R and
+    divby4 and returns an (N, 8) uint8 array of multisynth register bytes
+    in write order plus the P1, P2, P3 arrays"""
+
+    P1, P2, P3 = synth_parameters(a, b, c)
+    P1, P2, P3 = np.broadcast_arrays(np.atleast_1d(P1), P2, P3)
+
+    R = np.broadcast_to(np.asarray(R, dtype = np.int64), P1.shape)
+    divby4 = np.broadcast_to(np.asarray(divby4, dtype = bool), P1.shape)
+
+    # R divider bits, log2(R) for R = 1 to 128, 0 for anything else
+    validR = (R > 0) & (R <= 128) & ((R & (R - 1)) == 0)
+    rDivBits = np.where(validR, np.log2(np.where(validR, R, 1)).astype(np.int64), 0)
+
+    regs = np.empty(P1.shape + (8,), dtype = np.uint8)
+    regs[..., 0] = (P3>>8) & 0xFF
+    regs[..., 1] = P3 & 0xFF
+    regs[..., 2] = (rDivBits<<4) | (divby4*0b1100) | ((P1>>16) & 0x03)
+    regs[..., 3] = (P1>>8) & 0xFF
+    regs[..., 4] = P1 & 0xFF
+    regs[..., 5] = (((P3>>16) & 0x0F)<<4) | ((P2>>16) & 0x0F)
+    regs[..., 6] = (P2>>8) & 0xFF
+    regs[..., 7] = P2 & 0xFF
+
+    return (regs, P1, P2, P3)
+
+def limit_denominator(num, den, maxDenom = MAX_DENOM):
+    """limit_denominator, batch version of Fraction.limit_denominator.
+    Returns the numerator and denominator arrays of the closest fractions
+    to num/den with denominators <= maxDenom, found from the continued
+    fraction expansions"""
+
+    num = np.asarray(num, dtype = np.int64)
+    den = np.asarray(den, dtype = np.int64)
+
+    p0, q0 = np.zeros_like(num), np.ones_like(num)
+    p1, q1 = np.ones_like(num), np.zeros_like(num)
+    n, d = num.copy(), den.copy()
+    active = np.ones(num.shape, dtype = bool)
+
+    while active.any():
+        a = np.where(active, n//np.where(d == 0, 1, d), 0)
+        q2 = q0 + a*q1
+        active = active & (q2 <= maxDenom)
+
+        p0, q0, p1, q1 = (np.where(active, p1, p0), np.where(active, q1, q0),
+                          np.where(active, p0 + a*p1, p1), np.where(active, q2, q1))
+        n, d = np.where(active, d, n), np.where(active, n - a*d, d)
+        active = active & (d != 0)
+
+    # entries that stopped before the expansion ended, pick the closer
+    # of the last convergent and the largest allowed semiconvergent. They
+    # are 1/(q1*semiQ) apart and the convergent is d/(q1*den) from num/den
+    k = (maxDenom - q0)//q1
+    semiP, semiQ = p0 + k*p1, q0 + k*q1
+    useConvergent = 2*d*semiQ <= den
+
+    return (np.where(useConvergent, p1, semiP), np.where(useConvergent, q1, semiQ))
+
+def synth_settings_for_frequencies(freqs, pllFreq):
+    """synth_settings_for_frequencies, batch version of the fixed PLL
+    case of SI5351Aplanner.plan_frequency. Takes an array of output
+    frequencies (Hz) and the PLL frequency (Hz) and returns the arrays
+    (a, b, c, R, divby4, achieved frequency). Frequencies are rounded to
+    1/FREQ_SCALE Hz first, so one off that grid can get a different
+    approximation than plan_frequency"""
+
+    freqs = np.atleast_1d(np.asarray(freqs, dtype = np.float64))
+    fScaled = np.rint(freqs*FREQ_SCALE).astype(np.int64)
+    pll = int(round(pllFreq*FREQ_SCALE))
+
+    # smallest R divider that keeps the multisynth divider <= 2048
+    R = np.ones_like(fScaled)
+    for i in range(7):
+        R = np.where(pll > MS_MAX*fScaled*R, R*2, R)
+
+    den = fScaled*R
+    if (pll > MS_MAX*den).any() or (pll < 3*den).any():
+        raise ValueError('frequencies can not be reached from a %s Hz PLL' % pllFreq)
+
+    p, q = limit_denominator(pll, den)
+    a, b, c = p//q, p%q, q
+
+    # dividers below 8 are only allowed as integer 4 or 6, within
+    # MS_SNAP_TOLERANCE as in plan_frequency
+    low = pll < 8*den
+    msDiv = np.where(pll < 5*den, 4, 6)
+    snapError = np.abs(pll - msDiv*den)*MS_SNAP_TOLERANCE.denominator
+    bad = low & (snapError > msDiv*den*MS_SNAP_TOLERANCE.numerator)
+    if bad.any():
+        raise ValueError('%s Hz need dividers below 8 other than 4 or 6 from a %s Hz PLL'
+                         % (freqs[bad].tolist(), pllFreq))
+
+    a = np.where(low, msDiv, a)
+    b = np.where(low, 0, b)
+    c = np.where(low, 1, c)
+    divby4 = (a == 4) & (b == 0)
+
+    achieved = pllFreq*c/((a*c + b)*R)
+
+    return (a, b, c, R, divby4, achieved)
+
+def frequency_register_bytes(freqs, pllFreq):
+    """frequency_register_bytes, function to return the multisynth
+    register bytes for an array of output frequencies (Hz) from a PLL at
+    pllFreq (Hz). Returns the (N, 8) uint8 register byte array, the P1,
+    P2, P3 arrays and the achieved frequencies"""
+
+    a, b, c, R, divby4, achieved = synth_settings_for_frequencies(freqs, pllFreq)
+    regs, P1, P2, P3 = synth_register_bytes(a, b, c, R, divby4)
+
+    return (regs, P1, P2, P3, achieved)
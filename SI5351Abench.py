@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""SI5351Abench, benchmarks for the SI5351A python module. Counts the
+bus transactions, reads, writes and bytes each API call makes against a
+simulated device and times the CPU cost per call. Results are written
+as JSON and can be compared against a saved baseline
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# usage: python3 SI5351Abench.py [--shadow] [--repeat N] [--output FILE] [--compare BASELINE]
+#        python3 SI5351Abench.py --encode FRAMES
+
+import argparse
+import json
+import sys
+import time
+import SI5351A
+import SI5351Abus
+import SI5351Aexamples
+import SI5351Aplanner
+
+# i2c bytes on the wire besides the data, address + register for
+# writes, address + register + repeated start address for reads
+WRITE_OVERHEAD = 2
+READ_OVERHEAD = 3
+
+class CountingBus:
+
+    def __init__(self, bus):
+
+        self.bus = bus
+        self.reset()
+
+        return
+
+    def reset(self):
+        """reset, function to zero the counters"""
+
+        self.reads = 0
+        self.writes = 0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.wireBytes = 0
+
+        return
+
+    def counts(self):
+        """counts, function to return the counters in a dict"""
+
+        return {'transactions':self.reads + self.writes, 'reads':self.reads, 'writes':self.writes,
+                'bytesRead':self.bytesRead, 'bytesWritten':self.bytesWritten,
+                'wireBytes':self.wireBytes}
+
+    def write_i2c_block_data(self, address, reg, values):
+
+        self.writes = self.writes + 1
+        self.bytesWritten = self.bytesWritten + len(values)
+        self.wireBytes = self.wireBytes + WRITE_OVERHEAD + len(values)
+        self.bus.write_i2c_block_data(address, reg, values)
+
+        return
+
+    def write_byte_data(self, address, reg, value):
+
+        self.writes = self.writes + 1
+        self.bytesWritten = self.bytesWritten + 1
+        self.wireBytes = self.wireBytes + WRITE_OVERHEAD + 1
+        self.bus.write_byte_data(address, reg, value)
+
+        return
+
+    def read_i2c_block_data(self, address, reg, numRead):
+
+        self.reads = self.reads + 1
+        self.bytesRead = self.bytesRead + numRead
+        self.wireBytes = self.wireBytes + READ_OVERHEAD + numRead
+
+        return self.bus.read_i2c_block_data(address, reg, numRead)
+
+    def read_byte_data(self, address, reg):
+
+        self.reads = self.reads + 1
+        self.bytesRead = self.bytesRead + 1
+        self.wireBytes = self.wireBytes + READ_OVERHEAD + 1
+
+        return self.bus.read_byte_data(address, reg)
+
+def api_cases():
+    """api_cases, function to return the benchmark cases for the public
+    methods, {name:func(clockGen)}"""
+
+    return {
+        'set_pll':lambda c: c.set_pll('A', (24, 0, 1), intMode = True),
+        'set_pll_fractional':lambda c: c.set_pll('B', (24, 1, 2), intMode = False),
+        'set_clk_synth':lambda c: c.set_clk_synth(0, (400, 0, 1, 1), intMode = True),
+        'set_clk_synth_fractional':lambda c: c.set_clk_synth(2, (1100, 13, 27, 1), intMode = False),
+        'set_clk_control':lambda c: c.set_clk_control(0, pwrDown = False),
+        'set_frequency':lambda c: c.set_frequency(0, 14.0956e6),
+        'set_frequency_fixed_pll':lambda c: c.set_frequency(1, 7.0401e6, pll = 'B', pllFreq = 800e6),
+        'disable_all_outputs':lambda c: c.disable_all_outputs(),
+        'enable_outputs':lambda c: c.enable_outputs({0:True, 1:True}),
+        'pll_reset':lambda c: c.pll_reset(),
+        'disable_OEB_pin_all':lambda c: c.disable_OEB_pin_all(),
+        'enable_OEB_pin':lambda c: c.enable_OEB_pin({0:True}),
+        'fanout_enable':lambda c: c.fanout_enable(MS_FO = True),
+        'set_initial_offset':lambda c: c.set_initial_offset(1, 63),
+        'read_status':lambda c: c.read_status(),
+        'clear_status':lambda c: c.clear_status(),
+        'spread_spectrum_enable':lambda c: c.spread_spectrum_enable(True),
+        'set_spread_spectrum':lambda c: c.set_spread_spectrum(0.015, 'CENTER', 24),
+        'set_xtal_capacitance':lambda c: c.set_xtal_capacitance(10),
+        'set_clk_disable_state':lambda c: c.set_clk_disable_state({0:'HIGH_IMPEDANCE', 5:'LOW'}),
+        'read_register_map':lambda c: c.read_register_map(),
+    }
+
+def compute_cases():
+    """compute_cases, function to return the benchmark cases for the
+    functions that don't use the bus, {name:func(clockGen)}"""
+
+    return {
+        'get_synth_settings':lambda c: c.get_synth_settings(1100, 13, 27),
+        'p_byte_separation':lambda c: c.p_byte_separation(140788),
+        's_byte_separation':lambda c: c.s_byte_separation(32767),
+        'pll_synth_bytes':lambda c: SI5351A.pll_synth_bytes((24, 1, 2)),
+        'clk_synth_bytes':lambda c: SI5351A.clk_synth_bytes((1100, 13, 27, 1)),
+        'pack_synth_bytes':lambda c: SI5351A.pack_synth_bytes(c.frameBuffer, (1100, 13, 27, 1)),
+        'plan_frequency_cached':lambda c: c.plan_frequency(14.0956e6),
+        'plan_frequency_uncached':lambda c: SI5351Aplanner.plan_frequency.__wrapped__(c.xtal, 14.0956e6),
+    }
+
+def example_cases():
+    """example_cases, function to return benchmark cases for each
+    SI5351Aexamples.py example, run as is and inside a transaction,
+    {name:func(clockGen)}"""
+
+    def in_transaction(clockGen, example):
+        with clockGen.transaction():
+            SI5351Aexamples.run_example(clockGen, example)
+
+    cases = {}
+    for example in SI5351Aexamples.EXAMPLES:
+        cases['example_%d' % example] = lambda c, example = example: SI5351Aexamples.run_example(c, example)
+        cases['example_%d_transaction' % example] = lambda c, example = example: in_transaction(c, example)
+
+    return cases
+
+def byte_separation_frame(clockGen, synthSettings):
+    """byte_separation_frame, function to build a multisynth frame the
+    way set_clk_synth used to, with get_synth_settings, p_byte_separation
+    and list concatenation, for comparison in encode_benchmark"""
+
+    P1, P2, P3 = clockGen.get_synth_settings(synthSettings[0], synthSettings[1], synthSettings[2])
+    P1Bytes = clockGen.p_byte_separation(P1)
+    P2Bytes = clockGen.p_byte_separation(P2)
+    P3Bytes = clockGen.p_byte_separation(P3)
+
+    rBits = SI5351A.R_DIV_BITS.get(synthSettings[3], 0)<<4
+
+    return P3Bytes[1:] + [rBits | P1Bytes[0]] + P1Bytes[1:] + [(P3Bytes[0]<<4) | P2Bytes[0]] + P2Bytes[1:]
+
+def encode_benchmark(frames = 100000):
+    """encode_benchmark, function to time the multisynth frame encoders
+    over frames different synth settings. Returns the time per frame in
+    seconds for each encoder in a dict"""
+
+    clockGen = SI5351A.SI5351A(0x60, bus = SI5351Abus.SimulatedSI5351A(0x60))
+    settings = [(600 + i%1400, (i*7919)%1048575, 1048575, 1) for i in range(frames)]
+    buffer = bytearray(8 * 64)
+
+    def pack(synthSettings, i):
+        SI5351A.pack_synth_bytes(buffer, synthSettings, False, (i%64)*8)
+
+    encoders = {'byte_separation':lambda synthSettings, i: byte_separation_frame(clockGen, synthSettings),
+                'clk_synth_bytes':lambda synthSettings, i: SI5351A.clk_synth_bytes(synthSettings),
+                'pack_synth_bytes':pack}
+
+    results = {}
+    for name in encoders:
+        encoder = encoders[name]
+        start = time.perf_counter()
+        for i in range(frames):
+            encoder(settings[i], i)
+        results[name] = (time.perf_counter() - start)/frames
+
+    return results
+
+def run_case(func, shadow = False, repeat = 100):
+    """run_case, function to run a benchmark case on a new simulated
+    device. Bus counts are from the first call, CPU time is the average
+    over repeat calls. Returns a dict of results"""
+
+    counter = CountingBus(SI5351Abus.SimulatedSI5351A(0x60))
+    clockGen = SI5351A.SI5351A(0x60, bus = counter, shadow = 'READ' if shadow else None)
+
+    counter.reset()
+    func(clockGen)
+    result = counter.counts()
+
+    start = time.process_time()
+    for i in range(repeat):
+        func(clockGen)
+    result['cpuTime'] = (time.process_time() - start)/repeat
+
+    return result
+
+def run_benchmarks(shadow = False, repeat = 100):
+    """run_benchmarks, function to run every benchmark case and return
+    the results in a JSON serialisable dict"""
+
+    cases = {}
+    cases.update(api_cases())
+    cases.update(compute_cases())
+    cases.update(example_cases())
+
+    results = {}
+    for name in cases:
+        results[name] = run_case(cases[name], shadow, repeat)
+
+    return {'config':{'shadow':shadow, 'repeat':repeat}, 'cases':results}
+
+def compare_results(results, baseline, cpuTolerance = 1.5):
+    """compare_results, function to compare results against a baseline.
+    A case regresses if it makes more transactions or bytes on the
+    wire, or takes more than cpuTolerance times the baseline CPU time.
+    Returns a list of regression messages"""
+
+    regressions = []
+    for name in results['cases']:
+        if name not in baseline['cases']:
+            continue
+        new = results['cases'][name]
+        old = baseline['cases'][name]
+
+        for key in ('transactions', 'wireBytes'):
+            if new[key] > old[key]:
+                regressions.append('%s: %s %d -> %d' % (name, key, old[key], new[key]))
+
+        if new['cpuTime'] > old['cpuTime']*cpuTolerance:
+            regressions.append('%s: cpuTime %.3gs -> %.3gs' % (name, old['cpuTime'], new['cpuTime']))
+
+    return regressions
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = 'SI5351A bus and CPU cost benchmarks')
+    parser.add_argument('--shadow', action = 'store_true', help = 'enable the shadow register cache')
+    parser.add_argument('--repeat', type = int, default = 100, help = 'calls per case for CPU timing')
+    parser.add_argument('--output', help = 'write the JSON results to this file')
+    parser.add_argument('--compare', help = 'baseline JSON results to check for regressions')
+    parser.add_argument('--cpu-tolerance', type = float, default = 1.5, help = 'allowed CPU time ratio')
+    parser.add_argument('--encode', type = int, metavar = 'FRAMES', help = 'only time the frame encoders')
+    args = parser.parse_args()
+
+    if args.encode:
+        print(json.dumps(encode_benchmark(args.encode), indent = 2))
+        sys.exit(0)
+
+    results = run_benchmarks(args.shadow, args.repeat)
+    text = json.dumps(results, indent = 2, sort_keys = True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        regressions = compare_results(results, baseline, args.cpu_tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression, file = sys.stderr)
+
+        if regressions:
+            sys.exit(1)
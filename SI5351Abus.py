@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""SI5351Abus, i2c bus backends for the SI5351A python module, including
+an in-memory simulated Si5351A for running without hardware
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import ctypes
+import errno
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# buses opened by bus number, shared by every device on the same bus
+openBuses = {}
+openBusesLock = threading.Lock()
+
+# single thread executors serialising the transfers on each bus object
+busExecutors = {}
+
+# cross process bus locks by lock file path, see open_lock
+openLocks = {}
+
+# directory for lock files and the generation counter kept at the start
+# of each lock file
+LOCK_DIR = '/tmp'
+LOCK_GENERATION = struct.Struct('<Q')
+
+# largest smbus block transfer
+SMBUS_BLOCK_MAX = 32
+
+# I2C_RDWR ioctl request, read message flag and the kernel limit on
+# messages per ioctl (linux/i2c-dev.h, linux/i2c.h)
+I2C_RDWR = 0x0707
+I2C_M_RD = 0x0001
+RDWR_MAX_MSGS = 42
+
+# largest I2C_RDWR transfer used, enough for the whole register map
+RDWR_BLOCK_MAX = 256
+
+# register 0 & 1 status bits
+SYS_INIT = 0x80
+LOL_B = 0x40
+LOL_A = 0x20
+LOS = 0x10
+
+class SMBusBackend:
+
+    def __init__(self, busNumber = 1):
+
+        # smbus is only imported when a real bus is opened
+        try:
+            import smbus
+        except ImportError:
+            import smbus2 as smbus
+
+        self.busNumber = busNumber
+        self.bus = smbus.SMBus(busNumber)
+
+        return
+
+    def write_i2c_block_data(self, address, reg, values):
+        """write_i2c_block_data, function to do an smbus block write,
+        values can be any sequence of ints (smbus needs a list)"""
+
+        if not isinstance(values, list):
+            values = list(values)
+
+        self.bus.write_i2c_block_data(address, reg, values)
+
+        return
+
+    def write_byte_data(self, address, reg, value):
+
+        self.bus.write_byte_data(address, reg, value)
+
+        return
+
+    def read_i2c_block_data(self, address, reg, numRead):
+
+        return self.bus.read_i2c_block_data(address, reg, numRead)
+
+    def read_byte_data(self, address, reg):
+
+        return self.bus.read_byte_data(address, reg)
+
+    def close(self):
+
+        self.bus.close()
+
+        return
+
+class I2CMsg(ctypes.Structure):
+
+    # struct i2c_msg
+    _fields_ = [('addr', ctypes.c_uint16), ('flags', ctypes.c_uint16),
+                ('len', ctypes.c_uint16), ('buf', ctypes.POINTER(ctypes.c_uint8))]
+
+class I2CRdwrData(ctypes.Structure):
+
+    # struct i2c_rdwr_ioctl_data
+    _fields_ = [('msgs', ctypes.POINTER(I2CMsg)), ('nmsgs', ctypes.c_uint32)]
+
+class RdwrBackend:
+
+    def __init__(self, device = 1, ioctl = None):
+
+        # device is an i2c bus number or a /dev/i2c-N path. ioctl is
+        # called as ioctl(fd, I2C_RDWR, I2CRdwrData), by default
+        # fcntl.ioctl on the opened device. With another ioctl (e.g.
+        # SimulatedIoctl) no device file is opened
+        if isinstance(device, int):
+            device = '/dev/i2c-%d' % device
+
+        self.device = device
+        self.maxBlockSize = RDWR_BLOCK_MAX
+
+        if ioctl is None:
+            import fcntl
+            self.ioctl = fcntl.ioctl
+            self.fd = os.open(device, os.O_RDWR)
+        else:
+            self.ioctl = ioctl
+            self.fd = -1
+
+        return
+
+    def transfer(self, address, messages):
+        """transfer, function to send several i2c messages to address in
+        one I2C_RDWR ioctl, joined by repeated starts. A message is a
+        sequence of bytes to write or an int number of bytes to read.
+        Returns a list with the bytes read for each read message"""
+
+        if len(messages) < 1 or len(messages) > RDWR_MAX_MSGS:
+            raise ValueError('1 to %d messages per transfer' % RDWR_MAX_MSGS)
+
+        msgs = (I2CMsg * len(messages))()
+        buffers = []
+        for i in range(len(messages)):
+            message = messages[i]
+            if isinstance(message, int):
+                buffer = (ctypes.c_uint8 * message)()
+                msgs[i] = I2CMsg(address, I2C_M_RD, message, buffer)
+            else:
+                buffer = (ctypes.c_uint8 * len(message)).from_buffer_copy(bytes(message))
+                msgs[i] = I2CMsg(address, 0, len(message), buffer)
+            buffers.append(buffer)
+
+        self.ioctl(self.fd, I2C_RDWR, I2CRdwrData(msgs, len(messages)))
+
+        return [list(buffers[i]) for i in range(len(messages)) if isinstance(messages[i], int)]
+
+    def write_i2c_block_data(self, address, reg, values):
+        """write_i2c_block_data, function to write up to maxBlockSize
+        bytes starting at reg in one message"""
+
+        self.transfer(address, [bytes([reg]) + bytes(values)])
+
+        return
+
+    def write_byte_data(self, address, reg, value):
+
+        self.transfer(address, [bytes([reg, value])])
+
+        return
+
+    def read_i2c_block_data(self, address, reg, numRead):
+        """read_i2c_block_data, function to read up to maxBlockSize
+        bytes from reg, the register pointer write and the read are one
+        ioctl"""
+
+        return self.transfer(address, [bytes([reg]), numRead])[0]
+
+    def read_byte_data(self, address, reg):
+
+        return self.transfer(address, [bytes([reg]), 1])[0][0]
+
+    def write_blocks(self, address, blocks):
+        """write_blocks, function to write several (reg, values) blocks
+        with as few ioctls as possible, each block is one message"""
+
+        messages = [bytes([reg]) + bytes(values) for reg, values in blocks]
+        for i in range(0, len(messages), RDWR_MAX_MSGS):
+            self.transfer(address, messages[i:i + RDWR_MAX_MSGS])
+
+        return
+
+    def close(self):
+
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+        return
+
+def open_bus(bus = 1):
+    """open_bus, function to return the bus object for a device. bus
+    can be an i2c bus number, opened with smbus, or a /dev/i2c-N path,
+    opened with the I2C_RDWR backend. Either is shared by every device
+    on that bus. Any other object with the smbus write_byte_data,
+    write_i2c_block_data, read_byte_data and read_i2c_block_data
+    methods is returned as is"""
+
+    if isinstance(bus, (int, str)):
+        with openBusesLock:
+            if bus not in openBuses:
+                if isinstance(bus, int):
+                    openBuses[bus] = SMBusBackend(bus)
+                else:
+                    openBuses[bus] = RdwrBackend(bus)
+            return openBuses[bus]
+
+    return bus
+
+def bus_executor(bus):
+    """bus_executor, function to return the single worker thread
+    executor for a bus object. Work for every device on the bus is run
+    on this executor so transfers on one bus are serialised while
+    other buses carry on. Bus wrappers with a baseBus attribute share
+    the executor of the bus they wrap"""
+
+    while hasattr(bus, 'baseBus'):
+        bus = bus.baseBus
+
+    with openBusesLock:
+        if bus not in busExecutors:
+            busExecutors[bus] = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'SI5351Abus')
+        return busExecutors[bus]
+
+def bus_name(bus):
+    """bus_name, function to return the i2c-N name of the bus a bus
+    object (or wrapper) is on, smbus and I2C_RDWR backends on the same
+    bus get the same name"""
+
+    while hasattr(bus, 'baseBus'):
+        bus = bus.baseBus
+
+    if hasattr(bus, 'busNumber'):
+        return 'i2c-%d' % bus.busNumber
+    if hasattr(bus, 'device'):
+        return os.path.basename(bus.device)
+
+    raise ValueError('no bus name for %r, pass a lock file path' % (bus,))
+
+def lock_path(bus, address, lockDir = LOCK_DIR):
+    """lock_path, function to return the lock file path for a device
+    address on a bus object"""
+
+    return os.path.join(lockDir, 'SI5351A-%s-0x%02X.lock' % (bus_name(bus), address))
+
+class BusLock:
+
+    def __init__(self, path):
+
+        # fcntl is only imported when a lock is used
+        import fcntl
+        self.fcntl = fcntl
+
+        # flock on the lock file serialises processes, threadLock the
+        # threads of this process. depth counts reentrant acquires
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        self.threadLock = threading.RLock()
+        self.depth = 0
+
+        # generation counter from the lock file, valid while held
+        self.generation = 0
+
+        # lock metrics, see stats
+        self.acquisitions = 0
+        self.contended = 0
+        self.waitTotal = 0.0
+        self.waitMax = 0.0
+        self.holdTotal = 0.0
+        self.holdMax = 0.0
+        self.acquiredAt = 0.0
+
+        return
+
+    def acquire(self):
+        """acquire, function to take the lock, waiting for other threads
+        and processes holding it. The lock is reentrant, only the
+        outermost acquire takes the file lock. Returns the generation
+        counter, bumped by every holder that wrote to the device"""
+
+        start = time.perf_counter()
+
+        contended = not self.threadLock.acquire(blocking = False)
+        if contended:
+            self.threadLock.acquire()
+
+        if self.depth == 0:
+            try:
+                try:
+                    self.fcntl.flock(self.fd, self.fcntl.LOCK_EX | self.fcntl.LOCK_NB)
+                except BlockingIOError:
+                    contended = True
+                    self.fcntl.flock(self.fd, self.fcntl.LOCK_EX)
+
+                data = os.pread(self.fd, LOCK_GENERATION.size, 0)
+            except BaseException:
+                self.threadLock.release()
+                raise
+
+            if len(data) == LOCK_GENERATION.size:
+                self.generation = LOCK_GENERATION.unpack(data)[0]
+            else:
+                self.generation = 0
+
+            now = time.perf_counter()
+            wait = now - start
+            self.acquisitions = self.acquisitions + 1
+            self.contended = self.contended + contended
+            self.waitTotal = self.waitTotal + wait
+            self.waitMax = max(self.waitMax, wait)
+            self.acquiredAt = now
+
+        self.depth = self.depth + 1
+
+        return self.generation
+
+    def bump(self):
+        """bump, function to increment the generation counter in the
+        lock file, call while holding the lock after writing to the
+        device. Returns the new generation"""
+
+        self.generation = (self.generation + 1) & 0xFFFFFFFFFFFFFFFF
+        os.pwrite(self.fd, LOCK_GENERATION.pack(self.generation), 0)
+
+        return self.generation
+
+    def release(self):
+        """release, function to release the lock, the file lock is
+        released by the outermost release"""
+
+        self.depth = self.depth - 1
+
+        if self.depth == 0:
+            hold = time.perf_counter() - self.acquiredAt
+            self.holdTotal = self.holdTotal + hold
+            self.holdMax = max(self.holdMax, hold)
+            self.fcntl.flock(self.fd, self.fcntl.LOCK_UN)
+
+        self.threadLock.release()
+
+        return
+
+    def stats(self):
+        """stats, function to return the lock metrics, acquisitions,
+        contended (acquisitions that had to wait), total, mean and max
+        wait and hold times in seconds"""
+
+        count = max(self.acquisitions, 1)
+
+        return {'acquisitions':self.acquisitions, 'contended':self.contended,
+                'waitTotal':self.waitTotal, 'waitMean':self.waitTotal/count, 'waitMax':self.waitMax,
+                'holdTotal':self.holdTotal, 'holdMean':self.holdTotal/count, 'holdMax':self.holdMax}
+
+    def close(self):
+
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+        return
+
+def open_lock(path):
+    """open_lock, function to return the BusLock for a lock file path,
+    shared by every device in this process using the same path"""
+
+    with openBusesLock:
+        if path not in openLocks:
+            openLocks[path] = BusLock(path)
+        return openLocks[path]
+
+class SimulatedSI5351A:
+
+    def __init__(self, i2cAddress = 0x60, latency = 0.0):
+
+        self.i2cAddress = i2cAddress
+
+        # time taken by each bus transaction in seconds
+        self.latency = latency
+
+        # imported here as SI5351A imports this module
+        from SI5351A import RESET_DEFAULTS
+
+        self.regs = bytearray(256)
+        for reg in RESET_DEFAULTS:
+            self.regs[reg] = RESET_DEFAULTS[reg]
+
+        # transaction counters and PLL soft reset counts
+        self.transactions = 0
+        self.bytesWritten = 0
+        self.bytesRead = 0
+        self.pllResets = {'A':0, 'B':0}
+
+        self.lock = threading.Lock()
+
+        return
+
+    def transaction(self, address):
+        """transaction, function to check the device address and
+        account for a bus transaction"""
+
+        if address != self.i2cAddress:
+            raise OSError(errno.EREMOTEIO, 'no device at address 0x%02X' % address)
+
+        self.transactions = self.transactions + 1
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        return
+
+    def store(self, reg, value):
+        """store, function to apply a write to one register"""
+
+        if reg == 0:
+            # device status, read only
+            return
+        elif reg == 1:
+            # sticky status bits are cleared by writing 0
+            self.regs[1] = self.regs[1] & value
+        elif reg == 177:
+            # PLL soft reset, self clearing
+            if value & 0x20:
+                self.pllResets['A'] = self.pllResets['A'] + 1
+                self.regs[0] = self.regs[0] & ~LOL_A
+            if value & 0x80:
+                self.pllResets['B'] = self.pllResets['B'] + 1
+                self.regs[0] = self.regs[0] & ~LOL_B
+        else:
+            self.regs[reg] = value
+
+        return
+
+    def set_status(self, bits):
+        """set_status, function to simulate status events. bits are set
+        in register 0 and latched in the sticky register 1"""
+
+        with self.lock:
+            self.regs[0] = self.regs[0] | bits
+            self.regs[1] = self.regs[1] | (bits & 0xF0)
+
+        return
+
+    def clear_status(self, bits):
+        """clear_status, function to simulate status events ending. bits
+        are cleared in register 0, the sticky register 1 is unchanged"""
+
+        with self.lock:
+            self.regs[0] = self.regs[0] & ~bits
+
+        return
+
+    def write_i2c_block_data(self, address, reg, values):
+
+        if len(values) < 1 or len(values) > SMBUS_BLOCK_MAX:
+            raise OverflowError('block writes must be 1 to %d bytes' % SMBUS_BLOCK_MAX)
+
+        with self.lock:
+            self.transaction(address)
+            for i in range(len(values)):
+                self.store((reg + i) & 0xFF, values[i])
+            self.bytesWritten = self.bytesWritten + len(values)
+
+        return
+
+    def write_byte_data(self, address, reg, value):
+
+        with self.lock:
+            self.transaction(address)
+            self.store(reg, value)
+            self.bytesWritten = self.bytesWritten + 1
+
+        return
+
+    def read_i2c_block_data(self, address, reg, numRead):
+
+        if numRead < 1 or numRead > SMBUS_BLOCK_MAX:
+            raise OverflowError('block reads must be 1 to %d bytes' % SMBUS_BLOCK_MAX)
+
+        with self.lock:
+            self.transaction(address)
+            self.bytesRead = self.bytesRead + numRead
+            return [self.regs[(reg + i) & 0xFF] for i in range(numRead)]
+
+    def read_byte_data(self, address, reg):
+
+        with self.lock:
+            self.transaction(address)
+            self.bytesRead = self.bytesRead + 1
+            return self.regs[reg]
+
+class SimulatedBus:
+
+    def __init__(self, devices = ()):
+
+        # simulated devices by i2c address
+        self.devices = {}
+        for device in devices:
+            self.devices[device.i2cAddress] = device
+
+        return
+
+    def device(self, address):
+        """device, function to return the simulated device at address"""
+
+        if address not in self.devices:
+            raise OSError(errno.EREMOTEIO, 'no device at address 0x%02X' % address)
+
+        return self.devices[address]
+
+    def write_i2c_block_data(self, address, reg, values):
+
+        self.device(address).write_i2c_block_data(address, reg, values)
+
+        return
+
+    def write_byte_data(self, address, reg, value):
+
+        self.device(address).write_byte_data(address, reg, value)
+
+        return
+
+    def read_i2c_block_data(self, address, reg, numRead):
+
+        return self.device(address).read_i2c_block_data(address, reg, numRead)
+
+    def read_byte_data(self, address, reg):
+
+        return self.device(address).read_byte_data(address, reg)
+
+class SimulatedIoctl:
+
+    def __init__(self, devices = ()):
+
+        # simulated devices by i2c address, use as the ioctl of a
+        # RdwrBackend. Transfers aren't limited to 32 bytes
+        self.devices = {}
+        for device in devices:
+            self.devices[device.i2cAddress] = device
+
+        # ioctl calls and messages handled
+        self.calls = 0
+        self.messages = 0
+
+        return
+
+    def __call__(self, fd, request, data):
+
+        if request != I2C_RDWR:
+            raise OSError(errno.ENOTTY, 'unsupported ioctl 0x%04X' % request)
+
+        self.calls = self.calls + 1
+
+        # register pointer, set by the first byte of a write message. An
+        # ioctl is one bus transaction per device, joined by repeated starts
+        pointer = 0
+        started = set()
+        for i in range(data.nmsgs):
+            msg = data.msgs[i]
+            self.messages = self.messages + 1
+
+            if msg.addr not in self.devices:
+                raise OSError(errno.EREMOTEIO, 'no device at address 0x%02X' % msg.addr)
+            device = self.devices[msg.addr]
+
+            with device.lock:
+                if msg.addr not in started:
+                    device.transaction(msg.addr)
+                    started.add(msg.addr)
+                if msg.flags & I2C_M_RD:
+                    for j in range(msg.len):
+                        msg.buf[j] = device.regs[(pointer + j) & 0xFF]
+                    device.bytesRead = device.bytesRead + msg.len
+                    pointer = pointer + msg.len
+                elif msg.len > 0:
+                    pointer = msg.buf[0]
+                    for j in range(1, msg.len):
+                        device.store(pointer & 0xFF, msg.buf[j])
+                        pointer = pointer + 1
+                    device.bytesWritten = device.bytesWritten + msg.len - 1
+
+        return 0
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""SI5351Acbpro, importer for Skyworks ClockBuilder Pro (and ClockBuilder
+Desktop) Si5351 register map exports. Exports are parsed once into a
+register map image, cached by file hash and programmed with coalesced
+block writes
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import hashlib
+import os
+import re
+import threading
+from SI5351A import NUM_REGS
+
+# export file types loaded by load_directory
+EXPORT_EXTENSIONS = ('.h', '.txt', '.csv')
+
+# { 0x0002, 0x53 }, entries of the C header export register array
+HEADER_ENTRY = re.compile(r'\{\s*(0[xX][0-9A-Fa-f]+|\d+)\s*,\s*(0[xX][0-9A-Fa-f]+|\d+)\s*\}')
+
+# address, value lines of the text export, e.g. 2,53h or 0x02, 0x53
+TEXT_ENTRY = re.compile(r'^\s*(0[xX][0-9A-Fa-f]+|[0-9A-Fa-f]+[hH]|\d+)\s*[,\s]\s*(0[xX][0-9A-Fa-f]+|[0-9A-Fa-f]+[hH]|\d+)\s*$')
+
+# image holds all 188 registers, registers lists the addresses set by the export
+RegisterPlan = collections.namedtuple('RegisterPlan', ['name', 'image', 'registers', 'digest'])
+
+# parsed plans by SHA-256 of the file contents
+planCache = {}
+planCacheLock = threading.Lock()
+
+def parse_number(text):
+    """parse_number, function to convert 0x53, 53h or 83 to an int"""
+
+    if text[:2] in ('0x', '0X'):
+        return int(text[2:], 16)
+    elif text[-1] in 'hH':
+        return int(text[:-1], 16)
+
+    return int(text)
+
+def parse_register_map(text, name = 'register map'):
+    """parse_register_map, function to parse the text of a register map
+    export, either the C header (array of { address, value } entries) or
+    the text/CSV "address, value" list. Returns a validated RegisterPlan"""
+
+    if HEADER_ENTRY.search(text):
+        entries = [(m.group(1), m.group(2)) for m in HEADER_ENTRY.finditer(text)]
+    else:
+        entries = []
+        for line in text.splitlines():
+            m = TEXT_ENTRY.match(line)
+            if m:
+                entries.append((m.group(1), m.group(2)))
+
+    regValues = {}
+    for addressText, valueText in entries:
+        reg = parse_number(addressText)
+        value = parse_number(valueText)
+
+        if reg >= NUM_REGS:
+            raise ValueError('%s: register %d is outside 0 - %d' % (name, reg, NUM_REGS - 1))
+        if value > 0xFF:
+            raise ValueError('%s: register %d value 0x%X is not a byte' % (name, reg, value))
+        if reg in regValues and regValues[reg] != value:
+            raise ValueError('%s: register %d is set to 0x%02X and 0x%02X' % (name, reg, regValues[reg], value))
+
+        regValues[reg] = value
+
+    if not regValues:
+        raise ValueError('%s: no registers found' % name)
+
+    image = bytearray(NUM_REGS)
+    for reg in regValues:
+        image[reg] = regValues[reg]
+
+    digest = hashlib.sha256(text.encode()).hexdigest()
+
+    return RegisterPlan(name, bytes(image), tuple(sorted(regValues)), digest)
+
+def load_register_map(path):
+    """load_register_map, function to load a register map export file.
+    Plans are cached by the SHA-256 of the file contents, so reloading
+    an unchanged file only costs reading and hashing it"""
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    digest = hashlib.sha256(data).hexdigest()
+
+    with planCacheLock:
+        plan = planCache.get(digest)
+
+    if plan is None:
+        plan = parse_register_map(data.decode('utf-8', 'replace'), os.path.basename(path))
+        plan = plan._replace(digest = digest)
+        with planCacheLock:
+            planCache[digest] = plan
+
+    return plan
+
+def load_directory(path, extensions = EXPORT_EXTENSIONS):
+    """load_directory, function to load every register map export in a
+    directory. Returns {file name:RegisterPlan}"""
+
+    plans = {}
+    for fileName in sorted(os.listdir(path)):
+        if os.path.splitext(fileName)[1].lower() in extensions:
+            plans[fileName] = load_register_map(os.path.join(path, fileName))
+
+    return plans
+
+def program_register_map(clockGen, plan):
+    """program_register_map, function to program a RegisterPlan into
+    clockGen with SI5351A.write_image, outputs disabled, coalesced block
+    writes of the plan's registers, PLL reset and outputs enabled"""
+
+    clockGen.write_image(plan.image, plan.registers)
+
+    return
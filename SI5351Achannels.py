@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""SI5351Achannels, precompiled frequency channel tables for the
+SI5351A python module. A channel plan is compiled once into a file of
+fixed size register frames, the file is memory mapped and a channel
+is programmed by writing slices of its frame straight to the chip
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import mmap
+import struct
+import SI5351A
+import SI5351Aplanner
+
+# file header - magic, version, frame size, number of frames
+MAGIC = b'S5CT'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+
+# frame layout
+# bytes 0-7   PLL synth bytes, registers 26-33 (PLL A) or 34-41 (PLL B)
+# bytes 8-15  multisynth bytes, registers 42-49, 50-57 or 58-65
+# byte 16     flags
+# byte 17     reserved
+FRAME_SIZE = 18
+PLL_BYTES = slice(0, 8)
+SYNTH_BYTES = slice(8, 16)
+FLAGS = 16
+
+# flag bits
+FLAG_PLL_B = 0x01      # clock uses PLL B
+FLAG_PLL_INT = 0x02    # PLL integer mode
+FLAG_SYNTH_INT = 0x04  # multisynth integer mode
+
+def channel_frame(plan, pll = 'A'):
+    """channel_frame, function to return the register frame for a
+    channel. plan can be a FrequencyPlan or any object with the
+    pllSettings, pllIntMode, synthSettings, intMode and divby4 fields"""
+
+    flags = 0
+    if pll != 'A':
+        flags = flags | FLAG_PLL_B
+    if plan.pllIntMode == True:
+        flags = flags | FLAG_PLL_INT
+    if plan.intMode == True:
+        flags = flags | FLAG_SYNTH_INT
+
+    frame = SI5351A.pll_synth_bytes(plan.pllSettings)
+    frame = frame + SI5351A.clk_synth_bytes(plan.synthSettings, plan.divby4)
+    frame = frame + [flags, 0]
+
+    return bytes(frame)
+
+def compile_channel_table(path, plans, pll = 'A'):
+    """compile_channel_table, function to write a channel table file
+    from a list of FrequencyPlans (see channel_frame). Returns the
+    number of channels written"""
+
+    frames = [channel_frame(plan, pll) for plan in plans]
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, FRAME_SIZE, len(frames)))
+        for frame in frames:
+            f.write(frame)
+
+    return len(frames)
+
+def compile_frequencies(path, xtal, freqs, pll = 'A', pllFreq = None):
+    """compile_frequencies, function to plan a list of output frequencies
+    (Hz) for a crystal of xtal Hz and write them to a channel table file"""
+
+    plans = [SI5351Aplanner.plan_frequency(xtal, freq, pllFreq) for freq in freqs]
+
+    return compile_channel_table(path, plans, pll)
+
+class ChannelTable:
+
+    def __init__(self, path):
+
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+
+        magic, version, frameSize, count = HEADER.unpack_from(self.map, 0)
+
+        if magic != MAGIC or version != VERSION or frameSize != FRAME_SIZE:
+            self.close()
+            raise ValueError('%s is not a version %d channel table' % (path, VERSION))
+
+        if len(self.map) < HEADER.size + count*FRAME_SIZE:
+            self.close()
+            raise ValueError('%s is truncated' % path)
+
+        self.count = count
+
+        return
+
+    def __len__(self):
+
+        return self.count
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+
+        self.close()
+
+        return False
+
+    def close(self):
+        """close, function to unmap and close the channel table file"""
+
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+            self.map.close()
+            self.file.close()
+
+        return
+
+    def frame(self, index):
+        """frame, function to return the register frame for channel
+        index as a memoryview into the mapped file"""
+
+        if index < 0 or index >= self.count:
+            raise IndexError('channel %d out of range' % index)
+
+        start = HEADER.size + index*FRAME_SIZE
+
+        return self.view[start:start + FRAME_SIZE]
+
+    def program(self, clockGen, index, clk = 0, reset = False):
+        """program, function to set clock clk of clockGen to channel
+        index. The PLL and multisynth bytes are taken from the mapped
+        frame with no recalculation (copied to a list for the bus). The
+        PLL input source (the crystal, as set_pll), PLL and clock control
+        registers are only written if their bits change. Use the shadow
+        register cache to avoid control register reads. The bus lock
+        (see SI5351A.enable_lock) is held throughout. Clocks 0 - 5 only,
+        clocks 6 & 7 have integer only multisynths"""
+
+        if SI5351A.CLOCK_LAYOUT[clk].synthBytes != 8:
+            raise ValueError('clock %d has an integer only multisynth' % clk)
+
+        with clockGen.locked():
+            frame = self.frame(index)
+            flags = frame[FLAGS]
+            pllB = flags & FLAG_PLL_B
+
+            # PLL A & B source input, XTAL, see set_pll
+            if clockGen.shadow_read(reg = 15) != 0x00:
+                clockGen.single_access_write_i2c(reg = 15, regValue = 0x00)
+
+            clockGen.multi_access_write_i2c(reg = 34 if pllB else 26, regValues = frame[PLL_BYTES])
+            clockGen.multi_access_write_i2c(reg = SI5351A.CLOCK_LAYOUT[clk].synth, regValues = frame[SYNTH_BYTES])
+            clockGen.synthFrames.pop(clk, None)
+
+            # PLL integer mode, bit 6 of register 22 or 23
+            pllReg = 23 if pllB else 22
+            regValue = clockGen.shadow_read(reg = pllReg)
+            newValue = (regValue & 0xBF) | ((flags & FLAG_PLL_INT)<<5)
+            if newValue != regValue:
+                clockGen.single_access_write_i2c(reg = pllReg, regValue = newValue)
+
+            # clock control register, powered up, multisynth integer mode,
+            # PLL source and multisynth clock source, as set_frequency
+            regValue = clockGen.shadow_read(reg = SI5351A.CLOCK_LAYOUT[clk].control)
+            newValue = (regValue & 0x13) | ((flags & FLAG_SYNTH_INT)<<4) | (pllB<<5) | (0b11<<2)
+            if newValue != regValue:
+                clockGen.single_access_write_i2c(reg = SI5351A.CLOCK_LAYOUT[clk].control, regValue = newValue)
+
+            if reset == True:
+                clockGen.pll_reset()
+
+        return
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""SI5351Adaemon, resident frequency control daemon for the SI5351A
+python module. Owns the devices (with warm shadow register caches) and
+takes JSON commands from local clients over a Unix socket, one per line
+or length prefixed. A list of commands is run as one batch, in one
+transaction per device
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# usage: python3 SI5351Adaemon.py --socket PATH --device NAME,BUS,ADDRESS[,XTAL] [--device ...]
+#                                 [--channels NAME,PATH] [--simulate]
+#
+# request, one JSON object per line
+#   {"id":1, "cmd":"set_frequency", "device":"main", "args":[0, 10000000], "kwargs":{}}
+# or a JSON list of them for a batch. "device" can be left out when there
+# is one device. Messages starting with a 0 byte are a 4 byte big endian
+# length and the JSON, replies use the same framing as the request
+#
+# reply
+#   {"id":1, "ok":true, "result":...} or {"id":1, "ok":false, "error":"..."}
+#   batches, {"ok":..., "results":[...], "errors":{device:"..."}}
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import SI5351Abus
+import SI5351Achannels
+import SI5351Amanager
+
+# SI5351A methods clients can call
+METHODS = ('set_frequency', 'plan_frequency', 'fine_tune', 'set_pll', 'set_clk_synth',
+           'set_clk_synths', 'set_clk_control', 'set_clk_source', 'enable_outputs',
+           'disable_all_outputs', 'enable_OEB_pin', 'disable_OEB_pin_all', 'pll_reset',
+           'read_status', 'clear_status', 'set_xtal_capacitance', 'set_clk_disable_state',
+           'set_initial_offset', 'spread_spectrum_enable', 'set_spread_spectrum', 'fanout_enable')
+
+# daemon commands, hop to a channel table entry, read registers 0 & 1
+# and list the devices and channel tables
+COMMANDS = ('hop', 'status', 'devices')
+
+# socket file permissions, owner and group only. Anyone who can connect
+# can drive the clock generator
+SOCKET_MODE = 0o660
+
+# length prefix for length framed messages
+LENGTH = struct.Struct('>I')
+
+def from_json(value):
+    """from_json, function to convert JSON arguments back to the forms
+    the SI5351A methods use, dict keys that are numbers (clock numbers
+    in clkDict etc.) become ints"""
+
+    if isinstance(value, dict):
+        return {(int(k) if k.isdigit() else k):from_json(value[k]) for k in value}
+    if isinstance(value, list):
+        return [from_json(v) for v in value]
+
+    return value
+
+def to_json(value):
+    """to_json, function to convert results to JSON serialisable values,
+    named tuples become dicts and bytes lists"""
+
+    if hasattr(value, '_asdict'):
+        return {k:to_json(v) for k, v in value._asdict().items()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return list(value)
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k):to_json(value[k]) for k in value}
+
+    return value
+
+def error_text(e):
+
+    return '%s: %s' % (type(e).__name__, e)
+
+class SI5351ADaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path, manager, channels = None, mode = SOCKET_MODE):
+
+        # manager is an SI5351AManager with the devices, channels a dict
+        # of SI5351Achannels.ChannelTable by name, mode the socket file
+        # permissions
+        self.manager = manager
+        self.channels = channels if channels is not None else {}
+        self.path = path
+        self.mode = mode
+
+        # a socket file left by a daemon that didn't shut down cleanly
+        if os.path.exists(path):
+            os.unlink(path)
+
+        socketserver.UnixStreamServer.__init__(self, path, DaemonHandler)
+
+        return
+
+    def server_bind(self):
+
+        # the socket file is created with the umask, restrict it before
+        # any client can connect
+        socketserver.UnixStreamServer.server_bind(self)
+        os.chmod(self.path, self.mode)
+
+        return
+
+    def server_close(self):
+
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        return
+
+    def device_name(self, command):
+        """device_name, function to return the device a command is for"""
+
+        name = command.get('device')
+        if name is None:
+            if len(self.manager.devices) != 1:
+                raise ValueError('device is needed with more than one device')
+            name = next(iter(self.manager.devices))
+        elif name not in self.manager.devices:
+            raise ValueError('no device %s' % name)
+
+        return name
+
+    def run_command(self, device, command):
+        """run_command, function to run one command on a device"""
+
+        cmd = command.get('cmd')
+        args = from_json(command.get('args', []))
+        kwargs = from_json(command.get('kwargs', {}))
+
+        if cmd in METHODS:
+            return getattr(device, cmd)(*args, **kwargs)
+
+        if cmd == 'hop':
+            # kwargs table, index, clk = 0, reset = False
+            table = self.channels[kwargs.pop('table')]
+            return table.program(device, **kwargs)
+
+        if cmd == 'status':
+            status, sticky = device.multi_access_read_i2c(reg = 0, numRead = 2)
+            return {'status':status, 'sticky':sticky}
+
+        raise ValueError('unknown command %s' % cmd)
+
+    def run_batch(self, commands):
+        """run_batch, function to run a list of commands. Each device's
+        commands run in order in one transaction on its bus worker
+        thread, devices on different buses run in parallel. Returns the
+        reply dict"""
+
+        results = [None] * len(commands)
+        perDevice = {}
+
+        for i in range(len(commands)):
+            if commands[i].get('cmd') == 'devices':
+                results[i] = {'devices':sorted(self.manager.devices), 'channels':sorted(self.channels)}
+                continue
+            perDevice.setdefault(self.device_name(commands[i]), []).append(i)
+
+        def device_func(indices):
+            def func(device):
+                for i in indices:
+                    results[i] = to_json(self.run_command(device, commands[i]))
+            return func
+
+        configs = {name:device_func(perDevice[name]) for name in perDevice}
+        done, errors = self.manager.configure(configs, transaction = True)
+
+        reply = {'ok':not errors, 'results':results}
+        if errors:
+            reply['errors'] = {name:error_text(errors[name]) for name in errors}
+
+        return reply
+
+    def handle_request_object(self, request):
+        """handle_request_object, function to run a decoded request, a
+        command dict or a list of them, and return the reply"""
+
+        try:
+            if isinstance(request, list):
+                return self.run_batch(request)
+
+            reply = self.run_batch([request])
+            if reply['ok']:
+                reply = {'ok':True, 'result':reply['results'][0]}
+            else:
+                reply = {'ok':False, 'error':next(iter(reply['errors'].values()))}
+        except Exception as e:
+            reply = {'ok':False, 'error':error_text(e)}
+
+        if isinstance(request, dict) and 'id' in request:
+            reply['id'] = request['id']
+
+        return reply
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+
+        # requests from one client are answered in order, a client can
+        # send several before reading the replies
+        while True:
+            first = self.rfile.read(1)
+            if not first:
+                break
+
+            if first == b'\x00':
+                data = self.rfile.read(LENGTH.size - 1)
+                if len(data) < LENGTH.size - 1:
+                    break
+                length = LENGTH.unpack(first + data)[0]
+                message = self.rfile.read(length)
+                framed = True
+            else:
+                message = first + self.rfile.readline()
+                framed = False
+
+            if not message.strip():
+                continue
+
+            try:
+                request = json.loads(message)
+            except ValueError as e:
+                reply = {'ok':False, 'error':error_text(e)}
+            else:
+                reply = self.server.handle_request_object(request)
+
+            data = json.dumps(reply).encode()
+            if framed:
+                self.wfile.write(LENGTH.pack(len(data)) + data)
+            else:
+                self.wfile.write(data + b'\n')
+            self.wfile.flush()
+
+        return
+
+class DaemonError(Exception):
+
+    pass
+
+def command(cmd, *args, device = None, **kwargs):
+    """command, function to build a command dict for DaemonClient.batch,
+    e.g. command('set_frequency', 0, 10e6, device = 'main')"""
+
+    request = {'cmd':cmd, 'args':list(args), 'kwargs':kwargs}
+    if device is not None:
+        request['device'] = device
+
+    return request
+
+class DaemonClient:
+
+    def __init__(self, path, framed = False):
+
+        # framed = True sends length prefixed messages instead of lines
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile('rb')
+        self.framed = framed
+        self.nextId = 0
+
+        return
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+
+        self.close()
+
+        return False
+
+    def close(self):
+
+        self.rfile.close()
+        self.sock.close()
+
+        return
+
+    def send(self, request):
+        """send, function to send a request without waiting for the reply"""
+
+        data = json.dumps(request).encode()
+        if self.framed:
+            self.sock.sendall(LENGTH.pack(len(data)) + data)
+        else:
+            self.sock.sendall(data + b'\n')
+
+        return
+
+    def receive(self):
+        """receive, function to read the next reply"""
+
+        if self.framed:
+            length = LENGTH.unpack(self.rfile.read(LENGTH.size))[0]
+            data = self.rfile.read(length)
+        else:
+            data = self.rfile.readline()
+
+        if not data:
+            raise DaemonError('connection closed')
+
+        return json.loads(data)
+
+    def call(self, cmd, *args, device = None, **kwargs):
+        """call, function to run one command and return its result,
+        e.g. client.call('set_frequency', 0, 10e6). Raises DaemonError
+        if the command failed"""
+
+        request = command(cmd, *args, device = device, **kwargs)
+        self.nextId = self.nextId + 1
+        request['id'] = self.nextId
+
+        self.send(request)
+        reply = self.receive()
+        if not reply['ok']:
+            raise DaemonError(reply['error'])
+
+        return reply['result']
+
+    def batch(self, commands):
+        """batch, function to run a list of commands (see command) as one
+        batch and return the list of results. Raises DaemonError if any
+        device's commands failed, that device's writes are discarded"""
+
+        self.send(commands)
+        reply = self.receive()
+        if not reply['ok']:
+            raise DaemonError(reply.get('errors', reply.get('error')))
+
+        return reply['results']
+
+    def pipeline(self, commands):
+        """pipeline, function to send several commands before reading
+        any replies, each runs on its own. Returns the list of replies"""
+
+        for request in commands:
+            self.send(request)
+
+        return [self.receive() for request in commands]
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = 'SI5351A frequency control daemon')
+    parser.add_argument('--socket', default = '/tmp/SI5351A.sock', help = 'Unix socket path')
+    parser.add_argument('--mode', default = '660', help = 'socket file permissions, octal')
+    parser.add_argument('--device', action = 'append', default = [],
+                        help = 'NAME,BUS,ADDRESS[,XTAL], BUS is a bus number or /dev/i2c-N path')
+    parser.add_argument('--channels', action = 'append', default = [], help = 'NAME,PATH channel table')
+    parser.add_argument('--simulate', action = 'store_true', help = 'use simulated devices')
+    args = parser.parse_args()
+
+    manager = SI5351Amanager.SI5351AManager()
+    for spec in args.device or ['main,1,0x60']:
+        fields = spec.split(',')
+        name, bus, address = fields[0], fields[1], int(fields[2], 0)
+        xtal = float(fields[3]) if len(fields) > 3 else 25
+        if args.simulate:
+            bus = SI5351Abus.SimulatedSI5351A(address)
+        elif bus.isdigit():
+            bus = int(bus)
+        manager.add_device(name, address, xtal = xtal, shadow = 'READ', bus = bus)
+
+    channels = {}
+    for spec in args.channels:
+        name, path = spec.split(',', 1)
+        channels[name] = SI5351Achannels.ChannelTable(path)
+
+    server = SI5351ADaemon(args.socket, manager, channels, int(args.mode, 8))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -31,170 +31,187 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 # example 7: set both CLK0 & CLK1 to 1.5MHz,add 27ns offset to CLK1
 # example 9: disable all clock outputs and power down output drivers
 
+# run with --simulate to use the simulated Si5351A in SI5351Abus.py
+# instead of the i2c bus
+
+import sys
 import SI5351A
+import SI5351Abus
 
-example = 9
+# example numbers available in run_example
+EXAMPLES = (1, 2, 3, 4, 5, 6, 7, 9)
 
-clockGen = SI5351A.SI5351A(0x60)
+def run_example(clockGen, example):
+    """run_example, function to run one of the examples on clockGen"""
 
-# disable outputs
-clockGen.disable_all_outputs()
+    # disable outputs
+    clockGen.disable_all_outputs()
 
-# disable OEB pin for all clocks
-clockGen.disable_OEB_pin_all()
+    # disable OEB pin for all clocks
+    clockGen.disable_OEB_pin_all()
 
-if example == 1:
-    # set CLK0 to 1.5MHz - Integer mode
+    if example == 1:
+        # set CLK0 to 1.5MHz - Integer mode
 
-    # set PLLA to 600MHz - Integer Mode
-    clockGen.set_pll('A', (24, 0, 1), intMode = True)
+        # set PLLA to 600MHz - Integer Mode
+        clockGen.set_pll('A', (24, 0, 1), intMode = True)
 
-    # set CLK0 to 1.5MHz - Integer mode
-    # set CLK0 control register, register 16 - powered up,
-    # integer mode, PLLA, output not inverted, drive strength 2mA
-    clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
-    
-    # set CLK0 syth 
-    clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1), intMode = True, divby4 = False)
+        # set CLK0 to 1.5MHz - Integer mode
+        # set CLK0 control register, register 16 - powered up,
+        # integer mode, PLLA, output not inverted, drive strength 2mA
+        clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
 
-    # PLL reset
-    clockGen.pll_reset()
+        # set CLK0 syth 
+        clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1), intMode = True, divby4 = False)
 
-    # enable CLK0 output
-    clockGen.enable_outputs({0:True})
+        # PLL reset
+        clockGen.pll_reset()
 
-elif example == 2:
-    # set CLK0 to 125kHz - Integer mode
+        # enable CLK0 output
+        clockGen.enable_outputs({0:True})
 
-    # set PLLA to 600MHz - Integer Mode
-    clockGen.set_pll('A', (24, 0, 1), intMode = True)
+    elif example == 2:
+        # set CLK0 to 125kHz - Integer mode
 
-    # set CLK0 to 125kHz - Integer mode    
-    clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)     
-    clockGen.set_clk_synth(0, synthSettings = (1200, 0, 1, 4), intMode = True, divby4 = False)
+        # set PLLA to 600MHz - Integer Mode
+        clockGen.set_pll('A', (24, 0, 1), intMode = True)
 
-    # PLL reset
-    clockGen.pll_reset()
+        # set CLK0 to 125kHz - Integer mode    
+        clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)     
+        clockGen.set_clk_synth(0, synthSettings = (1200, 0, 1, 4), intMode = True, divby4 = False)
 
-    # enable CLK0 output
-    clockGen.enable_outputs({0:True})
+        # PLL reset
+        clockGen.pll_reset()
 
-elif example == 3:
-    # pass through CLK0 (500kHz) to CLK1
+        # enable CLK0 output
+        clockGen.enable_outputs({0:True})
 
-    # set PLLA to 600MHz - Integer Mode
-    clockGen.set_pll('A', (24, 0, 1), intMode = True)
+    elif example == 3:
+        # pass through CLK0 (500kHz) to CLK1
 
-    # set CLK0 to 500kHz - Integer mode    
-    clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)
-    clockGen.set_clk_synth(0, synthSettings = (1200, 0, 1, 0), intMode = True, divby4 = False)
+        # set PLLA to 600MHz - Integer Mode
+        clockGen.set_pll('A', (24, 0, 1), intMode = True)
 
-    # set CLK1 control register, register 17 - powered up,
-    # integer mode, PLLA, output not inverted, clock 0, drive strength 2mA
-    clockGen.set_clk_control(1, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'CLK0', driveStrength = 2)
-    
-    # enable multisynth fanout
-    clockGen.fanout_enable(MS_FO = True)
+        # set CLK0 to 500kHz - Integer mode    
+        clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)
+        clockGen.set_clk_synth(0, synthSettings = (1200, 0, 1, 0), intMode = True, divby4 = False)
 
-    # PLL reset
-    clockGen.pll_reset()
+        # set CLK1 control register, register 17 - powered up,
+        # integer mode, PLLA, output not inverted, clock 0, drive strength 2mA
+        clockGen.set_clk_control(1, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'CLK0', driveStrength = 2)
 
-    # enable CLK0 & CLK1 output
-    clockGen.enable_outputs({0:True, 1:True})
+        # enable multisynth fanout
+        clockGen.fanout_enable(MS_FO = True)
 
-elif example == 4:
-    #setting CLK0 to 1.5MHz, setting CLK1 to 1MHz
+        # PLL reset
+        clockGen.pll_reset()
 
-    # set PLLA to 600MHz - Integer Mode
-    clockGen.set_pll('A', (24, 0, 1), intMode = True)
+        # enable CLK0 & CLK1 output
+        clockGen.enable_outputs({0:True, 1:True})
 
-    # set CLK0 to 1.5MHz - Integer mode    
-    clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
-    clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1), intMode = True, divby4 = False)
+    elif example == 4:
+        #setting CLK0 to 1.5MHz, setting CLK1 to 1MHz
 
-    # set CLK1 to 1.5MHz - Integer mode    
-    clockGen.set_clk_control(1, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)     
-    clockGen.set_clk_synth(1, synthSettings = (600, 0, 1, 1), intMode = True, divby4 = False)
+        # set PLLA to 600MHz - Integer Mode
+        clockGen.set_pll('A', (24, 0, 1), intMode = True)
 
-    # PLL reset
-    clockGen.pll_reset()
+        # set CLK0 to 1.5MHz - Integer mode    
+        clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
+        clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1), intMode = True, divby4 = False)
 
-    # enable CLK0 & CLK1 output
-    clockGen.enable_outputs({0:True, 1:True})
+        # set CLK1 to 1.5MHz - Integer mode    
+        clockGen.set_clk_control(1, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)     
+        clockGen.set_clk_synth(1, synthSettings = (600, 0, 1, 1), intMode = True, divby4 = False)
 
-elif example == 5:
-    #setting CLK2 to 556.575kHz - Fractional mode
+        # PLL reset
+        clockGen.pll_reset()
 
-    # set PLLB to 612.5MHz - Fractional Mode
-    clockGen.set_pll('B', (24, 1, 2), intMode = False)
+        # enable CLK0 & CLK1 output
+        clockGen.enable_outputs({0:True, 1:True})
 
-    # set CLK2 to 556.575kHz - Fractional mode
-    # set CLK2 control register, register 18 - powered up,
-    # fractional mode, PLLA, output not inverted, drive strength 2mA
-    clockGen.set_clk_control(2, pwrDown = False, intMode = False, synthSource = 'B', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
-    clockGen.set_clk_synth(2, synthSettings = (1100, 13, 27, 1), intMode = False, divby4 = False)
+    elif example == 5:
+        #setting CLK2 to 556.575kHz - Fractional mode
 
-    # PLL reset
-    clockGen.pll_reset()
+        # set PLLB to 612.5MHz - Fractional Mode
+        clockGen.set_pll('B', (24, 1, 2), intMode = False)
 
-    # enable CLK2 output
-    clockGen.enable_outputs({2:True})
+        # set CLK2 to 556.575kHz - Fractional mode
+        # set CLK2 control register, register 18 - powered up,
+        # fractional mode, PLLA, output not inverted, drive strength 2mA
+        clockGen.set_clk_control(2, pwrDown = False, intMode = False, synthSource = 'B', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
+        clockGen.set_clk_synth(2, synthSettings = (1100, 13, 27, 1), intMode = False, divby4 = False)
 
-elif example == 6:
-    # setting CLK0 to 1.5MZ - Fractional mode with SS enabled at 1.5% center spread    
+        # PLL reset
+        clockGen.pll_reset()
 
-    # set PLLA to 600MHz - Fractional Mode
-    clockGen.set_pll('A', (24, 0, 1), intMode = False)
+        # enable CLK2 output
+        clockGen.enable_outputs({2:True})
 
-    # set CLK0 to 1.5MHz - Integer Mode mode    
-    clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
-    clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1), intMode = True, divby4 = False)
+    elif example == 6:
+        # setting CLK0 to 1.5MZ - Fractional mode with SS enabled at 1.5% center spread    
 
-    # set spread spectrum parameters
-    clockGen.set_spread_spectrum(sscAMP = 0.015, mode = 'CENTER', pllARatio = 24)
+        # set PLLA to 600MHz - Fractional Mode
+        clockGen.set_pll('A', (24, 0, 1), intMode = False)
 
-    # enable/disable spread spectrum
-    clockGen.spread_spectrum_enable(True)
+        # set CLK0 to 1.5MHz - Integer Mode mode    
+        clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
+        clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1), intMode = True, divby4 = False)
 
-    # PLL reset
-    clockGen.pll_reset()
+        # set spread spectrum parameters
+        clockGen.set_spread_spectrum(sscAMP = 0.015, mode = 'CENTER', pllARatio = 24)
 
-    # enable CLK0 & CLK1 output
-    clockGen.enable_outputs({0:True})
+        # enable/disable spread spectrum
+        clockGen.spread_spectrum_enable(True)
 
-elif example == 7:
-    # set both CLK0 & CLK1 to 1.5MHz,add 27ns offset to CLK1
+        # PLL reset
+        clockGen.pll_reset()
 
-    # set PLLA to 600MHz - Integer Mode
-    clockGen.set_pll('A', (24, 0, 1), intMode = True)
+        # enable CLK0 & CLK1 output
+        clockGen.enable_outputs({0:True})
 
-    # set CLK0 to 1.5MHz - Integer mode    
-    clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
-    clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1), intMode = True, divby4 = False)
+    elif example == 7:
+        # set both CLK0 & CLK1 to 1.5MHz,add 27ns offset to CLK1
 
-    # set CLK1 to 1.5MHz - Fractional mode    
-    clockGen.set_clk_control(1, pwrDown = False, intMode = False, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)     
-    clockGen.set_clk_synth(1, synthSettings = (400, 0, 1, 1), intMode = False, divby4 = False)
+        # set PLLA to 600MHz - Integer Mode
+        clockGen.set_pll('A', (24, 0, 1), intMode = True)
 
-    # add 27ns offset to CLK1
-    clockGen.set_initial_offset(1, 63)
+        # set CLK0 to 1.5MHz - Integer mode    
+        clockGen.set_clk_control(0, pwrDown = False, intMode = True, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)    
+        clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1), intMode = True, divby4 = False)
 
-    # PLL reset
-    clockGen.pll_reset()
+        # set CLK1 to 1.5MHz - Fractional mode    
+        clockGen.set_clk_control(1, pwrDown = False, intMode = False, synthSource = 'A', outInv = False, clkSource = 'SYNTH', driveStrength = 2)     
+        clockGen.set_clk_synth(1, synthSettings = (400, 0, 1, 1), intMode = False, divby4 = False)
 
-    # enable CLK0 & CLK1 output
-    clockGen.enable_outputs({0:True, 1:True})
+        # add 27ns offset to CLK1
+        clockGen.set_initial_offset(1, 63)
 
-    
-elif example == 9:
-    # disable all clock outputs
-    clockGen.disable_all_outputs()
+        # PLL reset
+        clockGen.pll_reset()
+
+        # enable CLK0 & CLK1 output
+        clockGen.enable_outputs({0:True, 1:True})
+
+
+    elif example == 9:
+        # disable all clock outputs
+        clockGen.disable_all_outputs()
+
+        # disable spread spectrum
+        clockGen.spread_spectrum_enable(False)
+
+        # clear CLK1 offset
+        clockGen.set_initial_offset(1, 0)
+
+    return
+
+if __name__ == "__main__":
 
-    # disable spread spectrum
-    clockGen.spread_spectrum_enable(False)
+    example = 9
 
-    # clear CLK1 offset
-    clockGen.set_initial_offset(1, 0)
-    
+    if '--simulate' in sys.argv:
+        clockGen = SI5351A.SI5351A(0x60, bus = SI5351Abus.SimulatedSI5351A(0x60))
+    else:
+        clockGen = SI5351A.SI5351A(0x60)
 
-    
+    run_example(clockGen, example)
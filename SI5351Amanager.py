@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""SI5351Amanager, manager for programming many Si5351A chips at once.
+Devices on different i2c buses are programmed in parallel, transfers on
+the same bus are serialised on that bus's worker thread
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import SI5351A
+import SI5351Abus
+
+def run_on_device(device, func, transaction):
+    """run_on_device, function to run func(device), optionally inside
+    a transaction so its writes are coalesced"""
+
+    if transaction == True:
+        with device.transaction():
+            return func(device)
+
+    return func(device)
+
+class SI5351AManager:
+
+    def __init__(self):
+
+        # devices by name
+        self.devices = {}
+
+        return
+
+    def add_device(self, name, i2cAddress = 0x60, xtal = 25, shadow = None, bus = 1, device = None):
+        """add_device, function to add a device to the manager, either
+        an existing SI5351A passed as device or a new one created from
+        the other arguments. Returns the device"""
+
+        if device is None:
+            device = SI5351A.SI5351A(i2cAddress, xtal = xtal, shadow = shadow, bus = bus)
+
+        self.devices[name] = device
+
+        return device
+
+    def remove_device(self, name):
+        """remove_device, function to remove a device from the manager"""
+
+        del self.devices[name]
+
+        return
+
+    def bus_groups(self):
+        """bus_groups, function to return the device names grouped by
+        bus object, {bus:[name, ...]}"""
+
+        groups = {}
+        for name in self.devices:
+            groups.setdefault(self.devices[name].bus, []).append(name)
+
+        return groups
+
+    def configure(self, configs, transaction = False, timeout = None):
+        """configure, function to run a function per device, configs
+        format {name:func} where func is called as func(device). Each
+        bus's devices are run one after another on the bus worker
+        thread, separate buses run in parallel. If transaction is True
+        each func runs inside a device transaction. Returns the dicts
+        (results, errors) keyed by device name"""
+
+        futures = {}
+        for name in configs:
+            device = self.devices[name]
+            executor = SI5351Abus.bus_executor(device.bus)
+            futures[name] = executor.submit(run_on_device, device, configs[name], transaction)
+
+        results = {}
+        errors = {}
+        for name in futures:
+            try:
+                results[name] = futures[name].result(timeout)
+            except Exception as e:
+                errors[name] = e
+
+        return (results, errors)
+
+    def apply(self, func, names = None, transaction = False, timeout = None):
+        """apply, function to run func(device) on every device, or the
+        devices in names, see configure"""
+
+        if names is None:
+            names = list(self.devices)
+
+        return self.configure({name:func for name in names}, transaction, timeout)
+
+    def call(self, method, *args, names = None, **kwargs):
+        """call, function to call an SI5351A method with the same
+        arguments on every device, or the devices in names, e.g.
+        manager.call('set_frequency', 0, 10e6). Returns (results, errors)"""
+
+        def func(device):
+            return getattr(device, method)(*args, **kwargs)
+
+        return self.apply(func, names)
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""SI5351Ametrics, i2c instrumentation for the SI5351A python module.
+Counts transfers, bytes and errors per register range and per public
+method, keeps latency histograms and can export Chrome trace / JSON
+spans. Nothing is added to the driver until a device is attached, so
+detached devices run at full speed
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+# register ranges used to group the counters, (first, last, name)
+REGISTER_RANGES = ((0, 2, 'status'), (3, 3, 'output enable'), (9, 9, 'OEB'),
+                   (15, 15, 'PLL input source'), (16, 23, 'clock control'),
+                   (24, 25, 'disable state'), (26, 41, 'PLL synth'), (42, 92, 'multisynth'),
+                   (149, 161, 'spread spectrum'), (162, 164, 'VCXO'), (165, 170, 'phase offset'),
+                   (177, 177, 'PLL reset'), (183, 183, 'xtal load'), (187, 187, 'fanout'))
+
+# register range name for every register address
+RANGE_NAMES = ['other'] * 256
+for first, last, name in REGISTER_RANGES:
+    for reg in range(first, last + 1):
+        RANGE_NAMES[reg] = name
+
+# latency histogram buckets, bucket n counts transfers taking less
+# than 2**n microseconds, the last bucket counts everything longer
+HISTOGRAM_BUCKETS = 24
+
+# SI5351A methods timed by attach, helpers they call (write_register_runs,
+# shadow_read etc.) are left to the method that called them. The bus
+# accessors are counted at the bus, transaction and locked return context
+# managers (the transaction flush is timed, see transaction_wrapper)
+TIMED_METHODS = ('read_register_map', 'enable_shadow', 'resync', 'enable_lock', 'verify',
+                 'snapshot', 'restore', 'write_image', 'set_pll', 'set_clk_synth', 'set_clk_synths',
+                 'write_clk_synth_frame', 'fine_tune', 'plan_frequency', 'set_frequency',
+                 'set_clk_source', 'plan_outputs', 'set_outputs', 'set_clk_control',
+                 'disable_all_outputs', 'enable_outputs', 'pll_reset', 'disable_OEB_pin_all',
+                 'enable_OEB_pin', 'fanout_enable', 'set_initial_offset', 'read_status',
+                 'clear_status', 'spread_spectrum_enable', 'set_spread_spectrum',
+                 'set_xtal_capacitance', 'set_clk_disable_state')
+
+def get_counters(table, name):
+    """get_counters, function to return the counters for name in table,
+    adding them if needed"""
+
+    counters = table.get(name)
+    if counters is None:
+        counters = table[name] = {'calls':0, 'bytes':0, 'errors':0, 'time':0.0}
+
+    return counters
+
+class I2CMetrics:
+
+    def __init__(self, keepSpans = 0):
+
+        # keepSpans is the number of recent spans kept for export, 0 for none
+        self.keepSpans = keepSpans
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+        return
+
+    def reset(self):
+        """reset, function to clear all counters, histograms and spans"""
+
+        with self.lock:
+            self.ranges = {}
+            self.methods = {}
+            self.histograms = {}
+            self.spans = collections.deque(maxlen = self.keepSpans) if self.keepSpans else None
+            self.epoch = time.perf_counter()
+
+        return
+
+    def add_callback(self, callback):
+        """add_callback, function to add a callback called as
+        callback(span) after every transfer and public method call. span
+        is a dict with the name, category (i2c or method), start & end
+        (perf_counter seconds), error and args"""
+
+        self.callbacks.append(callback)
+
+        return
+
+    def remove_callback(self, callback):
+
+        self.callbacks.remove(callback)
+
+        return
+
+    def current_method(self):
+        """current_method, function to return the outermost public method
+        running on this thread, or None"""
+
+        return getattr(self.local, 'method', None)
+
+    def add_span(self, span):
+        """add_span, function to keep a span for export and pass it to
+        the callbacks"""
+
+        if self.spans is not None:
+            with self.lock:
+                self.spans.append(span)
+
+        for callback in self.callbacks:
+            callback(span)
+
+        return
+
+    def record_transfer(self, op, address, reg, numBytes, start, end, error):
+        """record_transfer, function to count a bus transfer. Transfers
+        are counted against the register range of their first register
+        and the public method that made them"""
+
+        method = self.current_method()
+        duration = end - start
+        bucket = min(int(duration*1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+
+        with self.lock:
+            counters = get_counters(self.ranges, RANGE_NAMES[reg])
+            counters['calls'] = counters['calls'] + 1
+            counters['bytes'] = counters['bytes'] + numBytes
+            counters['errors'] = counters['errors'] + error
+            counters['time'] = counters['time'] + duration
+
+            histogram = self.histograms.get(op)
+            if histogram is None:
+                histogram = self.histograms[op] = [0] * HISTOGRAM_BUCKETS
+            histogram[bucket] = histogram[bucket] + 1
+
+            if method is not None:
+                counters = get_counters(self.methods, method)
+                counters['transfers'] = counters.get('transfers', 0) + 1
+                counters['bytes'] = counters['bytes'] + numBytes
+                counters['errors'] = counters['errors'] + error
+
+        if self.spans is not None or self.callbacks:
+            self.add_span({'name':op, 'cat':'i2c', 'start':start, 'end':end, 'error':error,
+                           'thread':threading.get_ident(),
+                           'args':{'address':address, 'reg':reg, 'bytes':numBytes, 'method':method}})
+
+        return
+
+    def record_method(self, name, start, end, error):
+        """record_method, function to count a public method call"""
+
+        with self.lock:
+            counters = get_counters(self.methods, name)
+            counters['calls'] = counters['calls'] + 1
+            counters['errors'] = counters['errors'] + error
+            counters['time'] = counters['time'] + end - start
+
+        if self.spans is not None or self.callbacks:
+            self.add_span({'name':name, 'cat':'method', 'start':start, 'end':end,
+                           'error':error, 'thread':threading.get_ident(), 'args':{}})
+
+        return
+
+    def summary(self):
+        """summary, function to return the counters and histograms in a
+        JSON serialisable dict"""
+
+        with self.lock:
+            return {'ranges':{name:dict(self.ranges[name]) for name in self.ranges},
+                    'methods':{name:dict(self.methods[name]) for name in self.methods},
+                    'histograms':{op:list(self.histograms[op]) for op in self.histograms}}
+
+    def export_json(self, path):
+        """export_json, function to write the summary and kept spans to
+        a JSON file"""
+
+        with self.lock:
+            spans = list(self.spans) if self.spans is not None else []
+
+        with open(path, 'w') as f:
+            json.dump({'summary':self.summary(), 'spans':spans}, f, indent = 2)
+
+        return
+
+    def export_chrome_trace(self, path):
+        """export_chrome_trace, function to write the kept spans in the
+        Chrome trace event format (chrome://tracing, Perfetto)"""
+
+        with self.lock:
+            spans = list(self.spans) if self.spans is not None else []
+
+        pid = os.getpid()
+        events = []
+        for span in spans:
+            events.append({'name':span['name'], 'cat':span['cat'], 'ph':'X', 'pid':pid,
+                           'tid':span['thread'],
+                           'ts':(span['start'] - self.epoch)*1e6,
+                           'dur':(span['end'] - span['start'])*1e6,
+                           'args':dict(span['args'], error = span['error'])})
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents':events, 'displayTimeUnit':'ms'}, f)
+
+        return
+
+class InstrumentedBus:
+
+    def __init__(self, bus, metrics):
+
+        # baseBus is used by SI5351Abus.bus_executor to find the real bus
+        self.baseBus = bus
+        self.metrics = metrics
+
+        # only offer write_blocks if the bus has it, see SI5351A.write_register_runs
+        if hasattr(bus, 'write_blocks'):
+            self.write_blocks = self.timed_write_blocks
+
+        return
+
+    def __getattr__(self, name):
+
+        # anything else the bus provides is passed through
+        return getattr(self.baseBus, name)
+
+    def timed(self, op, address, reg, numBytes, func, *args):
+        """timed, function to run a bus transfer and record it"""
+
+        start = time.perf_counter()
+        error = 0
+        try:
+            return func(address, reg, *args)
+        except Exception:
+            error = 1
+            raise
+        finally:
+            self.metrics.record_transfer(op, address, reg, numBytes, start, time.perf_counter(), error)
+
+    def timed_write_blocks(self, address, blocks):
+        """timed_write_blocks, function to time a write_blocks call,
+        counted against the register range of the first block"""
+
+        numBytes = sum(len(values) for reg, values in blocks)
+
+        return self.timed('write_blocks', address, blocks[0][0], numBytes,
+                          lambda address, reg: self.baseBus.write_blocks(address, blocks))
+
+    def write_i2c_block_data(self, address, reg, values):
+
+        return self.timed('write_block', address, reg, len(values), self.baseBus.write_i2c_block_data, values)
+
+    def write_byte_data(self, address, reg, value):
+
+        return self.timed('write_byte', address, reg, 1, self.baseBus.write_byte_data, value)
+
+    def read_i2c_block_data(self, address, reg, numRead):
+
+        return self.timed('read_block', address, reg, numRead, self.baseBus.read_i2c_block_data, numRead)
+
+    def read_byte_data(self, address, reg):
+
+        return self.timed('read_byte', address, reg, 1, self.baseBus.read_byte_data)
+
+def method_wrapper(metrics, name, func):
+    """method_wrapper, function to return a wrapper that times a public
+    method and makes it the current method for its transfers. Calls
+    made from inside another public method are left to the outer one"""
+
+    def wrapper(*args, **kwargs):
+
+        if getattr(metrics.local, 'method', None) is not None:
+            return func(*args, **kwargs)
+
+        metrics.local.method = name
+        start = time.perf_counter()
+        error = 0
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            error = 1
+            raise
+        finally:
+            metrics.local.method = None
+            metrics.record_method(name, start, time.perf_counter(), error)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = func.__doc__
+    wrapper.metricsWrapper = True
+
+    return wrapper
+
+def transaction_wrapper(metrics, func):
+    """transaction_wrapper, function to return a wrapper for the
+    transaction context manager that times the writes sent when the
+    outermost transaction exits and charges them to 'transaction'"""
+
+    @contextlib.contextmanager
+    def wrapper():
+
+        outer = getattr(metrics.local, 'method', None) is None
+        context = func()
+        result = context.__enter__()
+
+        try:
+            yield result
+        except BaseException as e:
+            if not context.__exit__(type(e), e, e.__traceback__):
+                raise
+            return
+
+        if not outer:
+            context.__exit__(None, None, None)
+            return
+
+        metrics.local.method = 'transaction'
+        start = time.perf_counter()
+        error = 0
+        try:
+            context.__exit__(None, None, None)
+        except Exception:
+            error = 1
+            raise
+        finally:
+            metrics.local.method = None
+            metrics.record_method('transaction', start, time.perf_counter(), error)
+
+        return
+
+    wrapper.__name__ = 'transaction'
+    wrapper.__doc__ = func.__doc__
+    wrapper.metricsWrapper = True
+
+    return wrapper
+
+def attach(clockGen, metrics = None):
+    """attach, function to start instrumenting an SI5351A. The bus is
+    wrapped in an InstrumentedBus and the public methods in TIMED_METHODS
+    on the instance are wrapped to time them. One I2CMetrics can be
+    shared by several devices. Returns the I2CMetrics"""
+
+    if metrics is None:
+        metrics = I2CMetrics()
+
+    detach(clockGen)
+    clockGen.bus = InstrumentedBus(clockGen.bus, metrics)
+
+    for name in TIMED_METHODS:
+        setattr(clockGen, name, method_wrapper(metrics, name, getattr(clockGen, name)))
+
+    clockGen.transaction = transaction_wrapper(metrics, clockGen.transaction)
+
+    return metrics
+
+def detach(clockGen):
+    """detach, function to stop instrumenting an SI5351A, restoring the
+    bus and the public methods"""
+
+    if isinstance(clockGen.bus, InstrumentedBus):
+        clockGen.bus = clockGen.bus.baseBus
+
+    for name in list(vars(clockGen)):
+        if getattr(vars(clockGen)[name], 'metricsWrapper', False):
+            delattr(clockGen, name)
+
+    return
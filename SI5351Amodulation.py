@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""SI5351Amodulation, timed FSK symbol scheduler for the SI5351A python
+module (WSPR, FT8 and other MFSK digital modes). The register writes for
+every tone change are worked out before transmitting, so at each symbol
+boundary only one precomputed block write is sent
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import math
+import time
+import SI5351A
+import SI5351Aplanner
+
+# digital mode presets, (tone spacing Hz, symbol time s)
+MODES = {'WSPR':(12000/8192, 8192/12000),
+         'FT8':(6.25, 0.16),
+         'FT4':(12000/576, 576/12000),
+         'JT65':(11025/4096, 4096/11025)}
+
+# time before a deadline when sleeping stops and the scheduler spins
+SPIN_TIME = 0.002
+
+# lateness in seconds above which a symbol counts as a missed deadline
+MISS_TIME = 0.001
+
+# symbols sent, missed deadlines, lateness of the completed writes against
+# their deadlines (mean, max and standard deviation in seconds), i2c bytes
+# written and the total time from the first deadline to the last write
+TimingReport = collections.namedtuple('TimingReport', ['symbols', 'missed', 'meanLateness',
+                                                       'maxLateness', 'jitter', 'bytesWritten',
+                                                       'duration'])
+
+class ModulationScheduler:
+
+    def __init__(self, clockGen, clk, baseFreq, toneSpacing, symbolTime, pll = 'A', pllFreq = None):
+
+        # tone n is sent at baseFreq + n*toneSpacing (Hz) for symbolTime
+        # seconds. The PLL is fixed and the tones are set with the
+        # multisynth, with pllFreq = None the PLL is planned for baseFreq
+        self.clockGen = clockGen
+        self.clk = clk
+        self.baseFreq = baseFreq
+        self.toneSpacing = toneSpacing
+        self.symbolTime = symbolTime
+        self.pll = pll
+
+        self.plan = clockGen.plan_frequency(baseFreq, pllFreq)
+        if pllFreq is None:
+            self.plan = clockGen.plan_frequency(baseFreq, self.plan.pllFreq)
+        self.pllFreq = self.plan.pllFreq
+
+        # multisynth frames by tone and the writes between tones,
+        # {(fromTone, toTone):(reg, values)}
+        self.frames = {}
+        self.transitions = {}
+
+        # tone the clock is set to, None until setup
+        self.tone = None
+
+        return
+
+    def tone_frequency(self, tone):
+        """tone_frequency, function to return the frequency (Hz) actually
+        produced for a tone"""
+
+        a, b, c, R = self.tone_settings(tone)
+
+        return self.pllFreq/((a + b/c)*R)
+
+    def tone_settings(self, tone):
+        """tone_settings, function to return the multisynth settings
+        (a, b, c, R) for a tone. A fixed denominator is used so tones
+        only differ in the low multisynth bytes"""
+
+        return SI5351Aplanner.fine_synth_settings(self.pllFreq, self.baseFreq + tone*self.toneSpacing,
+                                                  self.plan.synthSettings[3])
+
+    def prepare(self, symbols):
+        """prepare, function to work out the multisynth frame for every
+        distinct tone in symbols and the smallest write between each
+        pair of them"""
+
+        base = SI5351A.CLOCK_LAYOUT[self.clk].synth
+
+        for tone in set(symbols):
+            if tone not in self.frames:
+                self.frames[tone] = SI5351A.clk_synth_bytes(self.tone_settings(tone))
+
+        for old in self.frames:
+            for new in self.frames:
+                oldFrame = self.frames[old]
+                newFrame = self.frames[new]
+                changed = [i for i in range(8) if oldFrame[i] != newFrame[i]]
+
+                if changed:
+                    first, last = changed[0], changed[-1]
+                    self.transitions[(old, new)] = (base + first, newFrame[first:last + 1])
+                else:
+                    self.transitions[(old, new)] = None
+
+        return
+
+    def setup(self, tone = 0):
+        """setup, function to program the PLL and clock clk for a tone
+        in fractional mode and reset the PLL. Run before the first
+        transmission and after anything else changes the clock"""
+
+        self.prepare([tone])
+
+        with self.clockGen.transaction():
+            self.clockGen.set_frequency(self.clk, self.baseFreq, self.pll, self.pllFreq, reset = False)
+            self.clockGen.set_clk_synth(self.clk, self.tone_settings(tone), intMode = False)
+            self.clockGen.pll_reset()
+
+        self.tone = tone
+
+        return
+
+    def write_transition(self, transition):
+        """write_transition, function to send a precomputed tone change"""
+
+        reg, values = transition
+
+        if len(values) == 1:
+            self.clockGen.single_access_write_i2c(reg = reg, regValue = values[0])
+        else:
+            self.clockGen.multi_access_write_i2c(reg = reg, regValues = values)
+
+        return len(values)
+
+    def wait_until(self, deadline):
+        """wait_until, function to sleep until just before a
+        time.perf_counter deadline and then spin until it passes"""
+
+        remaining = deadline - time.perf_counter() - SPIN_TIME
+        if remaining > 0:
+            time.sleep(remaining)
+
+        while time.perf_counter() < deadline:
+            pass
+
+        return
+
+    def transmit(self, symbols, start = None, stop = None, missTime = MISS_TIME):
+        """transmit, function to send a symbol (tone number) sequence.
+        Symbol n starts at start + n*symbolTime, start is a
+        time.perf_counter time (monotonic) and defaults to now. stop is
+        an optional threading.Event to end the transmission early. The
+        clock must be set up (see setup). Returns a TimingReport"""
+
+        if self.tone is None:
+            raise ValueError('call setup before transmit')
+
+        symbols = list(symbols)
+        self.prepare(symbols)
+
+        if start is None:
+            start = time.perf_counter()
+
+        transitions = self.transitions
+        lateness = []
+        missed = 0
+        bytesWritten = 0
+        tone = self.tone
+
+        try:
+            for n in range(len(symbols)):
+                if stop is not None and stop.is_set():
+                    break
+
+                deadline = start + n*self.symbolTime
+                transition = transitions[(tone, symbols[n])]
+
+                self.wait_until(deadline)
+                if transition is not None:
+                    bytesWritten = bytesWritten + self.write_transition(transition)
+                tone = symbols[n]
+
+                # measured once the write is done, so the i2c time counts
+                late = time.perf_counter() - deadline
+
+                lateness.append(late)
+                if late > missTime:
+                    missed = missed + 1
+        finally:
+            self.tone = tone
+            # keep fine_tune/write_clk_synth_frame in step with the chip
+            self.clockGen.synthFrames[self.clk] = bytes(self.frames[tone])
+
+        duration = time.perf_counter() - start
+        if lateness:
+            mean = sum(lateness)/len(lateness)
+            jitter = math.sqrt(sum((late - mean)**2 for late in lateness)/len(lateness))
+            report = TimingReport(len(lateness), missed, mean, max(lateness), jitter, bytesWritten, duration)
+        else:
+            report = TimingReport(0, 0, 0.0, 0.0, 0.0, 0, 0.0)
+
+        return report
+
+def mode_scheduler(clockGen, clk, mode, baseFreq, pll = 'A', pllFreq = None):
+    """mode_scheduler, function to return a ModulationScheduler using
+    the tone spacing and symbol time of a digital mode in MODES, e.g.
+    mode_scheduler(clockGen, 0, 'WSPR', 14097000)"""
+
+    toneSpacing, symbolTime = MODES[mode]
+
+    return ModulationScheduler(clockGen, clk, baseFreq, toneSpacing, symbolTime, pll, pllFreq)
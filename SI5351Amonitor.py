@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""SI5351Amonitor, status monitor for the SI5351A python module. Polls
+the device status (register 0) and sticky status (register 1) with one
+block read, slowing the poll rate down while the device is healthy, and
+passes SYS_INIT, LOL_A, LOL_B and LOS changes to callbacks or an async
+iterator
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import collections
+import threading
+import time
+import SI5351Abus
+
+# status bits watched, name by bit
+STATUS_BITS = {SI5351Abus.SYS_INIT:'SYS_INIT', SI5351Abus.LOL_B:'LOL_B',
+               SI5351Abus.LOL_A:'LOL_A', SI5351Abus.LOS:'LOS'}
+STATUS_MASK = SI5351Abus.SYS_INIT | SI5351Abus.LOL_B | SI5351Abus.LOL_A | SI5351Abus.LOS
+
+# poll interval limits (s) and the back off factor while healthy
+MIN_INTERVAL = 0.01
+MAX_INTERVAL = 1.0
+BACKOFF = 2.0
+
+# state is 'SET' when a status bit comes on, 'CLEARED' when it goes off
+# and 'GLITCH' when it came on and went off again between two polls
+# (only seen in the sticky register). time is time.monotonic()
+StatusEvent = collections.namedtuple('StatusEvent', ['time', 'name', 'state'])
+
+class StatusMonitor:
+
+    def __init__(self, clockGen, minInterval = MIN_INTERVAL, maxInterval = MAX_INTERVAL,
+                 backoff = BACKOFF, clearSticky = True):
+
+        # the poll interval starts at minInterval, is multiplied by backoff
+        # after each healthy poll up to maxInterval and goes back to
+        # minInterval after an event or while a status bit is on
+        self.clockGen = clockGen
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.backoff = backoff
+        self.interval = minInterval
+
+        # clearSticky clears sticky bits once their condition has ended
+        self.clearSticky = clearSticky
+
+        # status bits on at the last poll, sticky bits left set after it
+        self.status = 0
+        self.sticky = 0
+
+        # polls, event counts {name:{state:count}}
+        self.polls = 0
+        self.counts = {name:{'SET':0, 'CLEARED':0, 'GLITCH':0} for name in STATUS_BITS.values()}
+
+        self.callbacks = []
+        self.thread = None
+        self.stopEvent = threading.Event()
+
+        # polls run on the bus worker thread, serialised with other work
+        # on the bus
+        self.executor = SI5351Abus.bus_executor(clockGen.bus)
+
+        return
+
+    def add_callback(self, callback):
+        """add_callback, function to add a callback called as
+        callback(event) with a StatusEvent for every status change"""
+
+        self.callbacks.append(callback)
+
+        return
+
+    def remove_callback(self, callback):
+
+        self.callbacks.remove(callback)
+
+        return
+
+    def read_status_regs(self):
+        """read_status_regs, function to read registers 0 & 1 in one
+        block read and clear the sticky bits whose condition has ended.
+        The bus is used directly so a transaction open on the device
+        doesn't buffer the clear. Values returned as (status, sticky)"""
+
+        clockGen = self.clockGen
+
+        # the bus lock (see SI5351A.enable_lock) covers the read and the
+        # clear so another process can't latch a bit in between
+        with clockGen.locked():
+            status, sticky = clockGen.bus.read_i2c_block_data(clockGen.i2cAddress, 0, 2)
+            status = status & STATUS_MASK
+            sticky = sticky & STATUS_MASK
+
+            clearBits = sticky & ~status
+            if self.clearSticky and clearBits:
+                # writing 0 clears a sticky bit, 1 leaves it alone
+                clockGen.bus.write_byte_data(clockGen.i2cAddress, 1, 0xFF & ~clearBits)
+
+        return (status, sticky)
+
+    def status_events(self, status, sticky):
+        """status_events, function to compare a status read with the
+        last one, update the counters and poll interval and return the
+        list of StatusEvents"""
+
+        now = time.monotonic()
+        events = []
+
+        # only sticky bits that have come on since the last poll are new,
+        # without clearSticky a bit stays on after its first glitch
+        newSticky = sticky & ~self.sticky
+
+        for bit in STATUS_BITS:
+            if status & bit and not self.status & bit:
+                state = 'SET'
+            elif self.status & bit and not status & bit:
+                state = 'CLEARED'
+            elif newSticky & bit and not status & bit:
+                state = 'GLITCH'
+            else:
+                continue
+
+            name = STATUS_BITS[bit]
+            self.counts[name][state] = self.counts[name][state] + 1
+            events.append(StatusEvent(now, name, state))
+
+        self.status = status
+        if self.clearSticky:
+            self.sticky = sticky & status
+        else:
+            self.sticky = sticky
+        self.polls = self.polls + 1
+
+        if events or status:
+            self.interval = self.minInterval
+        else:
+            self.interval = min(self.interval*self.backoff, self.maxInterval)
+
+        return events
+
+    def poll(self):
+        """poll, function to read the status once, pass any events to
+        the callbacks and return them"""
+
+        status, sticky = self.executor.submit(self.read_status_regs).result()
+        events = self.status_events(status, sticky)
+
+        for event in events:
+            for callback in self.callbacks:
+                callback(event)
+
+        return events
+
+    def run(self):
+        """run, function to poll until stop is called"""
+
+        while not self.stopEvent.is_set():
+            self.poll()
+            self.stopEvent.wait(self.interval)
+
+        return
+
+    def start(self):
+        """start, function to start polling on a background thread"""
+
+        if self.thread is None:
+            self.stopEvent.clear()
+            self.thread = threading.Thread(target = self.run, name = 'SI5351Amonitor', daemon = True)
+            self.thread.start()
+
+        return
+
+    def stop(self):
+        """stop, function to stop the background thread"""
+
+        if self.thread is not None:
+            self.stopEvent.set()
+            self.thread.join()
+            self.thread = None
+
+        return
+
+    async def events(self):
+        """events, async iterator of StatusEvents, use as
+        "async for event in monitor.events():". Polls with the same
+        adaptive interval as the thread, callbacks are also called"""
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            status, sticky = await loop.run_in_executor(self.executor, self.read_status_regs)
+
+            for event in self.status_events(status, sticky):
+                for callback in self.callbacks:
+                    callback(event)
+                yield event
+
+            await asyncio.sleep(self.interval)
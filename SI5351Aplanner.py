@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""SI5351Aplanner, frequency planning functions for the SI5351A
+python module
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import functools
+import math
+from fractions import Fraction
+
+# PLL (VCO) frequency range in Hz
+PLL_MIN = 600000000
+PLL_MAX = 900000000
+
+# clock output frequency range in Hz
+CLK_MIN = 2500
+CLK_MAX = 200000000
+
+# PLL feedback divider range, a in a + b/c
+PLL_A_MIN = 15
+PLL_A_MAX = 90
+
+# largest multisynth divider and largest c in a + b/c (20 bits)
+MS_MAX = 2048
+MAX_DENOM = 1048575
+
+# relative difference from 4 or 6 allowed for a multisynth divider
+# below 8 with a fixed PLL frequency (1 ppm)
+MS_SNAP_TOLERANCE = Fraction(1, 1000000)
+
+# number of plans kept by the plan_frequency LRU cache
+PLAN_CACHE_SIZE = 1024
+
+# pllSettings & synthSettings are in the (a, b, c) and (a, b, c, R) forms
+# used by set_pll and set_clk_synth. frequency is the achieved output
+# frequency and error the difference from the target in ppm
+FrequencyPlan = collections.namedtuple('FrequencyPlan', ['pllFreq', 'pllSettings', 'pllIntMode',
+                                                         'synthSettings', 'intMode', 'divby4',
+                                                         'frequency', 'error'])
+
+def rational_approximation(x, maxDenom = MAX_DENOM):
+    """rational_approximation, function to return the closest a + b/c
+    to x with c <= maxDenom. Uses the continued fraction expansion of x
+    (Fraction.limit_denominator). Values returned in the form (a, b, c)"""
+
+    x = Fraction(x).limit_denominator(maxDenom)
+    a = x.numerator // x.denominator
+
+    return (a, x.numerator - a*x.denominator, x.denominator)
+
+@functools.lru_cache(maxsize = PLAN_CACHE_SIZE)
+def plan_frequency(xtal, freq, pllFreq = None):
+    """plan_frequency, function to work out the PLL and multisynth
+    settings for a clock output frequency (Hz) given the crystal
+    frequency (Hz).
+
+    With pllFreq = None the PLL is free to move, the multisynth
+    uses the largest even integer divider that keeps the PLL in range
+    and the PLL ratio is fractional. With pllFreq set (e.g. a PLL
+    shared with other outputs) the PLL is kept at that frequency and
+    the multisynth divider is fractional, a divider below 8 must be
+    4 or 6 (within MS_SNAP_TOLERANCE). Results are cached, a repeated
+    (xtal, freq, pllFreq) is a dictionary lookup"""
+
+    target = Fraction(freq)
+    xtal = Fraction(xtal)
+
+    if target < CLK_MIN or target > CLK_MAX:
+        raise ValueError('clock frequency must be between %d and %d Hz' % (CLK_MIN, CLK_MAX))
+
+    R = 1
+
+    if pllFreq is None:
+        # R divider for frequencies below 600MHz/2048
+        while target*R*MS_MAX < PLL_MIN:
+            R = R*2
+
+        if target*R*4 >= PLL_MIN:
+            msDiv = 4
+        else:
+            msDiv = min(MS_MAX, int(PLL_MAX // (target*R)) & ~1)
+
+        pllSettings = rational_approximation(target*R*msDiv/xtal)
+        pll = xtal*(pllSettings[0] + Fraction(pllSettings[1], pllSettings[2]))
+        synthSettings = (msDiv, 0, 1, R)
+        ms = Fraction(msDiv)
+    else:
+        if pllFreq < PLL_MIN or pllFreq > PLL_MAX:
+            raise ValueError('PLL frequency must be between %d and %d Hz' % (PLL_MIN, PLL_MAX))
+
+        pllSettings = rational_approximation(Fraction(pllFreq)/xtal)
+        pll = xtal*(pllSettings[0] + Fraction(pllSettings[1], pllSettings[2]))
+
+        while pll/(target*R) > MS_MAX and R < 128:
+            R = R*2
+
+        ms = pll/(target*R)
+        if ms > MS_MAX or ms < 3:
+            raise ValueError('%s Hz can not be reached from a %s Hz PLL' % (freq, pllFreq))
+
+        if ms < 8:
+            # dividers below 8 are only allowed as integer 4 or 6
+            msDiv = 4 if ms < 5 else 6
+            if abs(ms - msDiv) > msDiv*MS_SNAP_TOLERANCE:
+                raise ValueError('%s Hz needs a divider of %.4f from a %s Hz PLL, below 8 only 4 or 6 are allowed'
+                                 % (freq, float(ms), pllFreq))
+            synthSettings = (msDiv, 0, 1, R)
+            ms = Fraction(msDiv)
+        else:
+            a, b, c = rational_approximation(ms)
+            synthSettings = (a, b, c, R)
+            ms = a + Fraction(b, c)
+
+    if pllSettings[0] < PLL_A_MIN or pllSettings[0] > PLL_A_MAX:
+        raise ValueError('PLL ratio %d is out of range for a %s Hz crystal' % (pllSettings[0], xtal))
+
+    achieved = pll/(ms*R)
+    error = float((achieved - target)/target)*1e6
+
+    # integer mode is only allowed for even integer multisynth dividers
+    intMode = synthSettings[1] == 0 and synthSettings[0]%2 == 0
+
+    return FrequencyPlan(float(pll), pllSettings, pllSettings[1] == 0, synthSettings,
+                         intMode, synthSettings[0] == 4, float(achieved), error)
+
+def fine_synth_settings(pllFreq, freq, R = 1, c = MAX_DENOM):
+    """fine_synth_settings, function to return the multisynth settings
+    (a, b, c, R) for an output frequency (Hz) from a PLL at pllFreq (Hz)
+    using a fixed denominator c instead of a rational approximation
+    search. Frequencies close together then share P3 and the upper P1
+    bytes, so SI5351A.fine_tune only rewrites a few bytes per step. The
+    divider is within 0.5/c of the exact value"""
+
+    q = round(Fraction(pllFreq)*c/(Fraction(freq)*R))
+
+    if q < 8*c or q > MS_MAX*c:
+        raise ValueError('%s Hz can not be reached from a %s Hz PLL with R = %d' % (freq, pllFreq, R))
+
+    return (q//c, q%c, c, R)
+
+# outputs 6 and 7 (MS6/MS7) only have even integer dividers
+MS67_MIN = 6
+MS67_MAX = 254
+
+# default output frequency tolerance in ppm for plan_outputs
+DEFAULT_TOLERANCE = 1.0
+
+# PLL frequencies kept after pruning for the PLL A/B pair search
+PLL_CANDIDATES = 24
+
+# PLL frequencies kept for each output on top of PLL_CANDIDATES
+OUTPUT_CANDIDATES = 2
+
+# pllFreqs is {'A':Hz, 'B':Hz} for the PLLs in use, assignments the PLL
+# ('A' or 'B') and plans the FrequencyPlan for each output. maxError is
+# the largest output error in ppm, integerOutputs the number of outputs
+# with an even integer (integer mode) multisynth divider
+OutputPlan = collections.namedtuple('OutputPlan', ['pllFreqs', 'assignments', 'plans',
+                                                   'maxError', 'integerOutputs'])
+
+@functools.lru_cache(maxsize = PLAN_CACHE_SIZE)
+def integer_pll_candidates(freq):
+    """integer_pll_candidates, function to return the PLL frequencies
+    (Fractions, Hz) that reach freq (Hz) with an integer multisynth
+    divider (4, 6 or 8-2048) and the smallest usable R divider. Values
+    returned in a dict {pllFreq:divider}. Results are cached, do not
+    change the dict"""
+
+    target = Fraction(freq)
+    R = 1
+    while target*R*MS_MAX < PLL_MIN and R < 128:
+        R = R*2
+
+    candidates = {}
+    for ms in range(max(4, math.ceil(PLL_MIN/(target*R))), min(MS_MAX, math.floor(PLL_MAX/(target*R))) + 1):
+        if ms < 8 and ms != 4 and ms != 6:
+            continue
+        candidates[target*R*ms] = ms
+
+    return candidates
+
+def output_plan(xtal, freq, pllFreq, clk):
+    """output_plan, function to return the FrequencyPlan for output clk
+    at freq (Hz) from a PLL at pllFreq (Hz), or None if clk can't reach
+    freq from that PLL. Uses the plan_frequency cache"""
+
+    try:
+        plan = plan_frequency(xtal, freq, pllFreq)
+    except ValueError:
+        return None
+
+    if clk == 6 or clk == 7:
+        if plan.intMode == False or plan.synthSettings[0] < MS67_MIN or plan.synthSettings[0] > MS67_MAX:
+            return None
+
+    return plan
+
+def output_cost(plan, tolerance):
+    """output_cost, function to rank an output plan, lower is better.
+    Out of tolerance first, then even integer, integer and fractional
+    dividers, then the error"""
+
+    if plan is None:
+        return (1, 3, math.inf)
+
+    if plan.intMode == True:
+        divider = 0
+    elif plan.synthSettings[1] == 0:
+        divider = 1
+    else:
+        divider = 2
+
+    return (abs(plan.error) > tolerance, divider, abs(plan.error))
+
+def plan_outputs(xtal, freqs, tolerance = DEFAULT_TOLERANCE, clks = None):
+    """plan_outputs, function to work out the PLL A & B frequencies and
+    the PLL each output uses for up to 8 output frequencies (Hz) given
+    the crystal frequency (Hz). tolerance is the allowed error in ppm,
+    one value or one per output. clks are the clock numbers of the
+    outputs, default 0, 1, 2... (clocks 6 & 7 only have even integer
+    dividers).
+
+    Candidate PLL frequencies are the ones giving an output an integer
+    divider plus the crystal multiples (integer mode PLL). They are
+    pruned to the PLL_CANDIDATES serving the most outputs with integer
+    dividers, then every PLL pair is tried with each output on the
+    better PLL. Plans in tolerance are preferred, then even integer
+    dividers, integer PLLs and the lowest error. Returns an OutputPlan,
+    raises ValueError if no plan is within tolerance"""
+
+    freqs = list(freqs)
+    if clks is None:
+        clks = list(range(len(freqs)))
+    if len(freqs) < 1 or len(freqs) > 8 or len(clks) != len(freqs):
+        raise ValueError('1 to 8 output frequencies, one per clock, are needed')
+
+    if isinstance(tolerance, (int, float)):
+        tolerances = [tolerance] * len(freqs)
+    else:
+        tolerances = list(tolerance)
+
+    xtal = Fraction(xtal)
+
+    # outputs served with an integer divider by each PLL frequency,
+    # even dividers count double
+    coverage = collections.Counter()
+    outputCandidates = []
+    for i in range(len(freqs)):
+        candidates = integer_pll_candidates(freqs[i])
+        if clks[i] == 6 or clks[i] == 7:
+            candidates = [pllFreq for pllFreq in candidates
+                          if candidates[pllFreq]%2 == 0 and MS67_MIN <= candidates[pllFreq] <= MS67_MAX]
+        for pllFreq in candidates:
+            coverage[pllFreq] = coverage[pllFreq] + (2 if integer_pll_candidates(freqs[i])[pllFreq]%2 == 0 else 1)
+        outputCandidates.append(candidates)
+
+    for n in range(math.ceil(PLL_MIN/xtal), math.floor(PLL_MAX/xtal) + 1):
+        coverage[xtal*n] = coverage[xtal*n]
+
+    def rank(pllFreq):
+        return (-coverage[pllFreq], (pllFreq/xtal).denominator != 1)
+
+    # the best candidates overall plus the best few for each output, so
+    # an output no other output shares a PLL with is not pruned away
+    pllFreqs = sorted(coverage, key = rank)[:PLL_CANDIDATES]
+    for candidates in outputCandidates:
+        for pllFreq in sorted(candidates, key = rank)[:OUTPUT_CANDIDATES]:
+            if pllFreq not in pllFreqs:
+                pllFreqs.append(pllFreq)
+
+    # output plans and costs for every output on every candidate PLL
+    plans = [[output_plan(xtal, freqs[i], pllFreq, clks[i]) for i in range(len(freqs))] for pllFreq in pllFreqs]
+    costs = [[output_cost(plans[p][i], tolerances[i]) for i in range(len(freqs))] for p in range(len(pllFreqs))]
+    pllCosts = [(pllFreq/xtal).denominator != 1 for pllFreq in pllFreqs]
+
+    best = None
+    for a in range(len(pllFreqs)):
+        for b in range(a, len(pllFreqs)):
+            choice = [a if costs[a][i] <= costs[b][i] else b for i in range(len(freqs))]
+            outputCosts = [costs[choice[i]][i] for i in range(len(freqs))]
+            used = set(choice)
+
+            score = (sum(cost[0] for cost in outputCosts),
+                     sum(cost[1] for cost in outputCosts) + sum(pllCosts[p] for p in used),
+                     max(cost[2] for cost in outputCosts),
+                     sum(cost[2] for cost in outputCosts))
+
+            if best is None or score < best[0]:
+                best = (score, choice)
+
+        # nothing beats every output in tolerance on even integer
+        # dividers from integer PLLs with no error
+        if best[0] == (0, 0, 0.0, 0.0):
+            break
+
+    score, choice = best
+    if score[0] > 0:
+        raise ValueError('no PLL plan reaches every output within tolerance')
+
+    names = {choice[0]:'A'}
+    for p in choice:
+        if p not in names:
+            names[p] = 'B'
+
+    outputPlans = [plans[choice[i]][i] for i in range(len(freqs))]
+
+    return OutputPlan({names[p]:outputPlans[choice.index(p)].pllFreq for p in names},
+                      [names[p] for p in choice], outputPlans,
+                      max(abs(plan.error) for plan in outputPlans),
+                      sum(plan.intMode for plan in outputPlans))
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""SI5351Arecord, bus transaction recording and replay for the SI5351A
+python module. A RecordingBus appends every transfer (time, op,
+address, register and bytes) to a compact binary log, which can be
+replayed against a real or simulated bus as fast as possible or with
+the original timing
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# usage: python3 SI5351Arecord.py LOG [--timing] [--simulate]
+
+import argparse
+import collections
+import json
+import struct
+import threading
+import time
+import SI5351Abus
+
+# log header - magic, version, time.time() when recording started
+MAGIC = b'S5BL'
+VERSION = 1
+HEADER = struct.Struct('<4sHd')
+
+# record - microseconds since the previous record, op, i2c address,
+# register, number of bytes - 1, followed by the bytes written or read
+RECORD = struct.Struct('<IBBBB')
+
+# ops, ERROR is set when the transfer raised (no bytes for reads)
+WRITE_BYTE = 1
+WRITE_BLOCK = 2
+READ_BYTE = 3
+READ_BLOCK = 4
+WRITE_BLOCKS = 5        # first block of a write_blocks call
+WRITE_BLOCKS_MORE = 6   # each later block of the same call, with a 0 delay
+ERROR = 0x80
+
+# longest delay a record can hold, about 71 minutes
+MAX_DELAY = 0xFFFFFFFF
+
+# time is seconds from the start of the log, error True if it raised
+LogRecord = collections.namedtuple('LogRecord', ['time', 'op', 'address', 'reg', 'data', 'error'])
+
+class RecordingBus:
+
+    def __init__(self, bus, path):
+
+        # baseBus is used by SI5351Abus.bus_executor to find the real bus
+        self.baseBus = bus
+        self.lock = threading.Lock()
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, time.time()))
+        self.last = time.perf_counter()
+        self.records = 0
+
+        # only offer write_blocks if the bus has it, see SI5351A.write_register_runs
+        if hasattr(bus, 'write_blocks'):
+            self.write_blocks = self.recorded_write_blocks
+
+        return
+
+    def __getattr__(self, name):
+
+        # anything else the bus provides is passed through
+        return getattr(self.baseBus, name)
+
+    def record(self, op, address, reg, data):
+        """record, function to append a transfer to the log"""
+
+        now = time.perf_counter()
+
+        with self.lock:
+            if op & ~ERROR == WRITE_BLOCKS_MORE:
+                # sent in the same call as the block before it
+                delay = 0
+            else:
+                delay = min(int((now - self.last)*1e6), MAX_DELAY)
+                self.last = now
+            count = max(len(data), 1)
+            self.file.write(RECORD.pack(delay, op, address, reg, count - 1) + bytes(data))
+            self.records = self.records + 1
+
+        return
+
+    def recorded(self, op, address, reg, func, args, data = None):
+        """recorded, function to run a bus transfer and record it, data
+        is the bytes written or None to record the bytes read"""
+
+        try:
+            result = func(address, reg, *args)
+        except Exception:
+            self.record(op | ERROR, address, reg, data if data is not None else b'')
+            raise
+
+        if data is None:
+            data = [result] if op == READ_BYTE else result
+        self.record(op, address, reg, data)
+
+        return result
+
+    def write_i2c_block_data(self, address, reg, values):
+
+        return self.recorded(WRITE_BLOCK, address, reg, self.baseBus.write_i2c_block_data, (values,), values)
+
+    def write_byte_data(self, address, reg, value):
+
+        return self.recorded(WRITE_BYTE, address, reg, self.baseBus.write_byte_data, (value,), [value])
+
+    def read_i2c_block_data(self, address, reg, numRead):
+
+        return self.recorded(READ_BLOCK, address, reg, self.baseBus.read_i2c_block_data, (numRead,))
+
+    def read_byte_data(self, address, reg):
+
+        return self.recorded(READ_BYTE, address, reg, self.baseBus.read_byte_data, ())
+
+    def recorded_write_blocks(self, address, blocks):
+        """recorded_write_blocks, function to run and record a
+        write_blocks call, one record per block"""
+
+        error = 0
+        try:
+            self.baseBus.write_blocks(address, blocks)
+        except Exception:
+            error = ERROR
+            raise
+        finally:
+            op = WRITE_BLOCKS
+            for reg, values in blocks:
+                self.record(op | error, address, reg, values)
+                op = WRITE_BLOCKS_MORE
+
+        return
+
+    def flush(self):
+
+        with self.lock:
+            self.file.flush()
+
+        return
+
+    def close(self):
+
+        with self.lock:
+            self.file.close()
+
+        return
+
+def start_recording(clockGen, path):
+    """start_recording, function to start recording the bus transfers
+    of an SI5351A to a log file. Returns the RecordingBus"""
+
+    stop_recording(clockGen)
+    clockGen.bus = RecordingBus(clockGen.bus, path)
+
+    return clockGen.bus
+
+def stop_recording(clockGen):
+    """stop_recording, function to stop recording, closing the log and
+    taking the RecordingBus out of the device's bus wrappers"""
+
+    parent = None
+    bus = clockGen.bus
+    while bus is not None and not isinstance(bus, RecordingBus):
+        parent = bus
+        bus = getattr(bus, 'baseBus', None)
+
+    if bus is not None:
+        bus.close()
+        if parent is None:
+            clockGen.bus = bus.baseBus
+        else:
+            parent.baseBus = bus.baseBus
+
+    return
+
+def read_log(path):
+    """read_log, function to return the start time (time.time()) and
+    the list of LogRecords in a log file"""
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic, version, startTime = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('%s is not a version %d bus log' % (path, VERSION))
+
+    records = []
+    offset = HEADER.size
+    elapsed = 0
+    while offset + RECORD.size <= len(data):
+        delay, op, address, reg, count = RECORD.unpack_from(data, offset)
+        offset = offset + RECORD.size
+        elapsed = elapsed + delay
+
+        # failed reads have no bytes
+        if op & ERROR and op & ~ERROR in (READ_BYTE, READ_BLOCK):
+            payload = b''
+        else:
+            payload = data[offset:offset + count + 1]
+            offset = offset + count + 1
+
+        records.append(LogRecord(elapsed/1e6, op & ~ERROR, address, reg, payload, bool(op & ERROR)))
+
+    return (startTime, records)
+
+def replay(path, bus, timing = False, checkReads = False):
+    """replay, function to re-issue the transfers in a log on a bus
+    object. Failed transfers are skipped. timing = True keeps the
+    original spacing between transfers, otherwise they run as fast as
+    possible. checkReads = True compares the bytes read with the log.
+    WRITE_BLOCKS_MORE records without their first block (a damaged
+    log) are skipped and counted as orphans. Returns a dict of counts
+    and the duration"""
+
+    startTime, records = read_log(path)
+    counts = {'writes':0, 'reads':0, 'bytes':0, 'readMismatches':0, 'orphans':0}
+
+    start = time.perf_counter()
+    i = 0
+    while i < len(records):
+        record = records[i]
+        i = i + 1
+        if record.error:
+            continue
+
+        if record.op == WRITE_BLOCKS_MORE:
+            # its WRITE_BLOCKS record would have taken it
+            counts['orphans'] = counts['orphans'] + 1
+            continue
+
+        if timing == True:
+            remaining = start + record.time - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+
+        if record.op == WRITE_BYTE:
+            bus.write_byte_data(record.address, record.reg, record.data[0])
+        elif record.op == WRITE_BLOCK:
+            bus.write_i2c_block_data(record.address, record.reg, list(record.data))
+        elif record.op == WRITE_BLOCKS:
+            # the blocks of one write_blocks call, sent together if the bus can
+            blocks = [(record.reg, list(record.data))]
+            while i < len(records) and records[i].op == WRITE_BLOCKS_MORE:
+                blocks.append((records[i].reg, list(records[i].data)))
+                i = i + 1
+
+            if hasattr(bus, 'write_blocks'):
+                bus.write_blocks(record.address, blocks)
+            else:
+                for reg, values in blocks:
+                    bus.write_i2c_block_data(record.address, reg, values)
+            counts['writes'] = counts['writes'] + len(blocks) - 1
+            counts['bytes'] = counts['bytes'] + sum(len(values) for reg, values in blocks[1:])
+        elif record.op == READ_BYTE:
+            data = [bus.read_byte_data(record.address, record.reg)]
+        else:
+            data = bus.read_i2c_block_data(record.address, record.reg, len(record.data))
+
+        if record.op in (READ_BYTE, READ_BLOCK):
+            counts['reads'] = counts['reads'] + 1
+            if checkReads == True and bytes(data) != record.data:
+                counts['readMismatches'] = counts['readMismatches'] + 1
+        else:
+            counts['writes'] = counts['writes'] + 1
+        counts['bytes'] = counts['bytes'] + len(record.data)
+
+    counts['duration'] = time.perf_counter() - start
+
+    return counts
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = 'replay an SI5351A bus log')
+    parser.add_argument('log', help = 'log file from start_recording')
+    parser.add_argument('--bus', default = '1', help = 'i2c bus number or /dev/i2c-N path')
+    parser.add_argument('--timing', action = 'store_true', help = 'keep the original timing')
+    parser.add_argument('--simulate', action = 'store_true', help = 'replay on simulated devices')
+    args = parser.parse_args()
+
+    if args.simulate:
+        startTime, records = read_log(args.log)
+        addresses = sorted(set(record.address for record in records))
+        bus = SI5351Abus.SimulatedBus([SI5351Abus.SimulatedSI5351A(address) for address in addresses])
+    else:
+        bus = SI5351Abus.open_bus(int(args.bus) if args.bus.isdigit() else args.bus)
+
+    print(json.dumps(replay(args.log, bus, args.timing), indent = 2))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""SI5351Asweep, streaming frequency sweeps for the SI5351A python
+module. Sweep points are generated lazily from linear, logarithmic or
+any other frequency iterator and programmed with fine_tune at a fixed
+dwell, so sweeps of millions of points use constant memory
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import math
+import time
+import SI5351A
+import SI5351Aplanner
+
+# time before a step deadline when sleeping stops and the sweep spins
+SPIN_TIME = 0.002
+
+# lateness in seconds above which a point counts as late
+LATE_TIME = 0.001
+
+# one sweep point, index from 0, freq the requested and actualFreq the
+# produced frequency (Hz), newPll True when the PLL was changed (and
+# reset) for this point, bytesWritten the multisynth bytes fine_tune
+# wrote (0 for newPll points)
+SweepStep = collections.namedtuple('SweepStep', ['index', 'freq', 'actualFreq', 'synthSettings',
+                                                 'newPll', 'bytesWritten'])
+
+# points programmed, PLL changes, fine_tune bytes written, points
+# written more than LATE_TIME after their deadline and the total time in
+# seconds
+SweepReport = collections.namedtuple('SweepReport', ['points', 'pllChanges', 'bytesWritten',
+                                                     'late', 'duration'])
+
+def linear_freqs(start, stop, points):
+    """linear_freqs, function to generate points frequencies (Hz) evenly
+    spaced from start to stop, both included"""
+
+    if points == 1:
+        yield start
+        return
+
+    step = (stop - start)/(points - 1)
+    for n in range(points):
+        yield start + n*step
+
+    return
+
+def log_freqs(start, stop, points):
+    """log_freqs, function to generate points frequencies (Hz) spaced by
+    a constant ratio from start to stop, both included"""
+
+    if points == 1:
+        yield start
+        return
+
+    logStep = math.log(stop/start)/(points - 1)
+    for n in range(points):
+        yield start*math.exp(n*logStep)
+
+    return
+
+def sweep_settings(xtal, freqs, c = SI5351Aplanner.MAX_DENOM):
+    """sweep_settings, function to generate (freq, pllFreq, synthSettings,
+    actualFreq) for each frequency (Hz) in freqs. A PLL frequency and R
+    divider are planned when the sweep starts and only again when a
+    point can't be reached from them, in between each point is one
+    division by the fixed pllFreq*c/R ratio (the same multisynth
+    settings as SI5351Aplanner.fine_synth_settings) with no search.
+    Fractional multisynths need a divider of 8 or more, so sweeps go up
+    to PLL_MAX/8 (112.5MHz)"""
+
+    pllFreq = None
+    qMin = 8*c
+    qMax = SI5351Aplanner.MS_MAX*c
+
+    for freq in freqs:
+        q = -1 if pllFreq is None else int(ratio/freq + 0.5)
+
+        if q < qMin or q > qMax:
+            plan = SI5351Aplanner.plan_frequency(xtal, freq)
+            pllFreq = plan.pllFreq
+            R = plan.synthSettings[3]
+            ratio = pllFreq*c/R
+            q = int(ratio/freq + 0.5)
+
+            if q < qMin or q > qMax:
+                raise ValueError('%s Hz is above the %s Hz sweep limit' % (freq, SI5351Aplanner.PLL_MAX/8))
+
+        a, b = divmod(q, c)
+
+        yield (freq, pllFreq, (a, b, c, R), ratio/q)
+
+    return
+
+class FrequencySweep:
+
+    def __init__(self, clockGen, clk, freqs, dwell = 0.0, callback = None, pll = 'A',
+                 c = SI5351Aplanner.MAX_DENOM):
+
+        # freqs is any iterable of frequencies (Hz), e.g. linear_freqs or
+        # log_freqs, and is only read as the sweep runs. Each point is held
+        # for dwell seconds. callback(SweepStep) is called after each
+        # point is written, e.g. to take a measurement, and can return
+        # False to end the sweep
+        if SI5351A.CLOCK_LAYOUT[clk].synthBytes != 8:
+            raise ValueError('clock %d has an integer only multisynth' % clk)
+
+        self.clockGen = clockGen
+        self.clk = clk
+        self.freqs = freqs
+        self.dwell = dwell
+        self.callback = callback
+        self.pll = pll
+        self.c = c
+
+        return
+
+    def steps(self):
+        """steps, function to generate the sweep points as (freq,
+        pllFreq, synthSettings, actualFreq), see sweep_settings"""
+
+        return sweep_settings(self.clockGen.xtal, self.freqs, self.c)
+
+    def set_pll(self, freq, pllFreq, synthSettings):
+        """set_pll, function to program the PLL and the clock for the
+        first point on a new PLL frequency, in fractional mode, and reset
+        the PLL"""
+
+        clockGen = self.clockGen
+
+        with clockGen.transaction():
+            clockGen.set_frequency(self.clk, freq, self.pll, pllFreq, reset = False)
+            clockGen.set_clk_synth(self.clk, synthSettings, intMode = False)
+            clockGen.pll_reset()
+
+        return
+
+    def wait_until(self, deadline):
+        """wait_until, function to sleep until just before a
+        time.perf_counter deadline and then spin until it passes"""
+
+        remaining = deadline - time.perf_counter() - SPIN_TIME
+        if remaining > 0:
+            time.sleep(remaining)
+
+        while time.perf_counter() < deadline:
+            pass
+
+        return
+
+    def run(self, stop = None):
+        """run, function to program each sweep point in turn. Point n is
+        written at n*dwell seconds from the start. stop is an optional
+        threading.Event to end the sweep early. Returns a SweepReport"""
+
+        clockGen = self.clockGen
+        clk = self.clk
+        callback = self.callback
+        dwell = self.dwell
+
+        lastPll = None
+        points = pllChanges = bytesWritten = late = 0
+
+        start = time.perf_counter()
+        for n, (freq, pllFreq, synthSettings, actualFreq) in enumerate(self.steps()):
+            if stop is not None and stop.is_set():
+                break
+
+            if dwell > 0:
+                deadline = start + n*dwell
+                self.wait_until(deadline)
+                if time.perf_counter() - deadline > LATE_TIME:
+                    late = late + 1
+
+            newPll = pllFreq != lastPll
+            if newPll:
+                self.set_pll(freq, pllFreq, synthSettings)
+                written = 0
+                pllChanges = pllChanges + 1
+                lastPll = pllFreq
+            else:
+                written = clockGen.fine_tune(clk, synthSettings)
+
+            points = points + 1
+            bytesWritten = bytesWritten + written
+
+            if callback is not None:
+                if callback(SweepStep(n, freq, actualFreq, synthSettings, newPll, written)) == False:
+                    break
+
+        return SweepReport(points, pllChanges, bytesWritten, late, time.perf_counter() - start)
+
+def sweep(clockGen, clk, freqs, dwell = 0.0, callback = None, pll = 'A', stop = None):
+    """sweep, function to sweep clock clk through freqs (Hz), e.g.
+    sweep(clockGen, 0, log_freqs(1e6, 30e6, 100000), 0.001, measure).
+    See FrequencySweep. Returns a SweepReport"""
+
+    return FrequencySweep(clockGen, clk, freqs, dwell, callback, pll).run(stop)
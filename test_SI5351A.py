@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""test_SI5351A, tests for the SI5351A python module run on the
+simulated Si5351A in SI5351Abus.py, python3 -m pytest
+
+created October 16, 2026
+last modified October 16, 2026"""
+
+"""
+Copyright 2023 Owain Martin
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import pytest
+import SI5351A
+import SI5351Abus
+import SI5351Achannels
+import SI5351Aplanner
+import SI5351Arecord
+
+def simulated_clock(shadow):
+    """simulated_clock, function to return (device, clockGen) for a
+    simulated Si5351A with PLL A feeding clocks 0 & 1 and PLL B feeding
+    clock 2, after the start up reset of both PLLs"""
+
+    device = SI5351Abus.SimulatedSI5351A(0x60)
+    clockGen = SI5351A.SI5351A(0x60, shadow = shadow, bus = device)
+
+    clockGen.set_pll('A', (24, 0, 1), intMode = True)
+    clockGen.set_pll('B', (24, 1, 2), intMode = False)
+    clockGen.set_clk_control(0, pwrDown = False, synthSource = 'A')
+    clockGen.set_clk_control(1, pwrDown = False, intMode = False, synthSource = 'A')
+    clockGen.set_clk_control(2, pwrDown = False, intMode = False, synthSource = 'B')
+    clockGen.set_clk_synth(0, synthSettings = (400, 0, 1, 1))
+    clockGen.set_clk_synth(1, synthSettings = (400, 0, 1, 1), intMode = False)
+    clockGen.set_clk_synth(2, synthSettings = (1100, 13, 27, 1), intMode = False)
+    clockGen.pll_reset()
+    assert device.pllResets == {'A':1, 'B':1}
+
+    return (device, clockGen)
+
+def reset_counts(device, clockGen):
+    """reset_counts, function to run pll_reset and return the number of
+    PLL A & B resets it did"""
+
+    resets = dict(device.pllResets)
+    clockGen.pll_reset()
+
+    return {pll:device.pllResets[pll] - resets[pll] for pll in resets}
+
+@pytest.mark.parametrize('shadow', [None, 'READ'])
+def test_set_pll_resets_that_pll(shadow):
+
+    device, clockGen = simulated_clock(shadow)
+
+    clockGen.set_pll('B', (25, 0, 1), intMode = True)
+    assert reset_counts(device, clockGen) == {'A':0, 'B':1}
+
+    clockGen.set_pll('A', (26, 0, 1), intMode = True)
+    assert reset_counts(device, clockGen) == {'A':1, 'B':0}
+
+@pytest.mark.parametrize('shadow', [None, 'READ'])
+def test_clock_changes_reset_their_pll(shadow):
+
+    device, clockGen = simulated_clock(shadow)
+
+    clockGen.set_initial_offset(1, 31)
+    assert reset_counts(device, clockGen) == {'A':1, 'B':0}
+
+    clockGen.fine_tune(0, (400, 1, 2, 1))
+    assert reset_counts(device, clockGen) == {'A':1, 'B':0}
+
+    clockGen.set_clk_synth(2, synthSettings = (1000, 1, 3, 1), intMode = False)
+    assert reset_counts(device, clockGen) == {'A':0, 'B':1}
+
+def test_pll_source_bits():
+
+    device, clockGen = simulated_clock('READ')
+
+    # PLLB_SRC only
+    clockGen.single_access_write_i2c(reg = 15, regValue = 0x08)
+    assert reset_counts(device, clockGen) == {'A':0, 'B':1}
+
+    # back to the crystal
+    clockGen.set_pll('B', (24, 1, 2), intMode = False)
+    assert reset_counts(device, clockGen) == {'A':0, 'B':1}
+
+def test_nothing_changed_no_reset():
+
+    device, clockGen = simulated_clock('READ')
+
+    clockGen.set_pll('A', (24, 0, 1), intMode = True)
+    clockGen.set_initial_offset(1, 0)
+    assert reset_counts(device, clockGen) == {'A':0, 'B':0}
+
+def test_explicit_reset():
+
+    device, clockGen = simulated_clock(None)
+
+    assert reset_counts(device, clockGen) == {'A':0, 'B':0}
+    clockGen.pll_reset('BOTH')
+    assert device.pllResets == {'A':2, 'B':2}
+
+def test_fixed_pll_small_divider():
+
+    plan = SI5351Aplanner.plan_frequency(25000000, 200000000, 800000000)
+    assert plan.synthSettings == (4, 0, 1, 1) and plan.error == 0
+
+    # a divider of 7.36 can't be rounded to 6
+    with pytest.raises(ValueError):
+        SI5351Aplanner.plan_frequency(25000000, 108700000, 800000000)
+
+def test_batch_small_divider():
+
+    SI5351Abatch = pytest.importorskip('SI5351Abatch')
+
+    a, b, c, R, divby4, achieved = SI5351Abatch.synth_settings_for_frequencies([200000000, 7000000], 800000000)
+    assert a.tolist() == [4, 114] and divby4.tolist() == [True, False]
+
+    with pytest.raises(ValueError):
+        SI5351Abatch.synth_settings_for_frequencies([108700000, 7000000], 800000000)
+
+def test_replay_write_blocks(tmp_path):
+
+    path = str(tmp_path/'bus.log')
+    device = SI5351Abus.SimulatedSI5351A(0x60)
+    recorder = SI5351Arecord.RecordingBus(SI5351Abus.RdwrBackend(ioctl = SI5351Abus.SimulatedIoctl([device])), path)
+    recorder.write_blocks(0x60, [(26, [1, 2, 3]), (42, [4, 5])])
+    recorder.write_byte_data(0x60, 3, 0xFF)
+    recorder.close()
+
+    replayed = SI5351Abus.SimulatedSI5351A(0x60)
+    counts = SI5351Arecord.replay(path, SI5351Abus.RdwrBackend(ioctl = SI5351Abus.SimulatedIoctl([replayed])))
+    assert replayed.regs == device.regs
+    assert (counts['writes'], counts['bytes'], counts['orphans']) == (3, 6, 0)
+
+    # a WRITE_BLOCKS_MORE record without its first block is skipped
+    with open(path, 'ab') as f:
+        f.write(SI5351Arecord.RECORD.pack(0, SI5351Arecord.WRITE_BLOCKS_MORE, 0x60, 50, 0) + bytes([9]))
+    counts = SI5351Arecord.replay(path, SI5351Abus.SimulatedBus([SI5351Abus.SimulatedSI5351A(0x60)]))
+    assert (counts['writes'], counts['reads'], counts['orphans']) == (3, 0, 1)
+
+def test_channel_table_program(tmp_path):
+
+    path = str(tmp_path/'channels.bin')
+    SI5351Achannels.compile_frequencies(path, 25000000, [7000000, 14000000])
+
+    device, clockGen = simulated_clock('READ')
+    clockGen.single_access_write_i2c(reg = 15, regValue = 0x04)
+    with SI5351Achannels.ChannelTable(path) as table:
+        table.program(clockGen, 1, clk = 0, reset = True)
+        with pytest.raises(ValueError):
+            table.program(clockGen, 0, clk = 6)
+
+    # back to the crystal, only PLL A reset
+    assert device.regs[15] == 0x00
+    assert device.pllResets == {'A':2, 'B':1}